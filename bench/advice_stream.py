@@ -0,0 +1,66 @@
+"""
+Compares time to first token on /advice/stream with the total latency of
+/advice, using a fake Gemini client (bench/fake_gemini.py) with a fixed
+pace. It also checks that the streamed chunks add up to the full advice
+and that the stream ends with a "done" event.
+
+    python -m bench.advice_stream [--first-chunk-delay 0.4] [--chunk-delay 0.1]
+"""
+import json
+import time
+import argparse
+
+from bench.common import make_app, register, seed_transactions
+from bench.fake_gemini import FakeGeminiClient
+
+def read_events(response, started):
+    # Yields (event, data, seconds since started) as the SSE stream arrives
+    buffer = ""
+    for data in response.response:
+        buffer += data.decode()
+        while "\n\n" in buffer:
+            message, buffer = buffer.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in message.splitlines())
+            yield fields["event"], json.loads(fields["data"]), time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--first-chunk-delay", type=float, default=0.4)
+    parser.add_argument("--chunk-delay", type=float, default=0.1)
+    args = parser.parse_args()
+
+    app = make_app()
+    fake = FakeGeminiClient(first_chunk_delay=args.first_chunk_delay, chunk_delay=args.chunk_delay)
+    app.config["API_CLIENT"] = fake
+
+    # Separate users so neither request is answered from the advice cache
+    user_id, blocking_client = register(app, "blocking")
+    seed_transactions(app, user_id, 200)
+    user_id, streaming_client = register(app, "streaming")
+    seed_transactions(app, user_id, 200)
+
+    started = time.perf_counter()
+    blocking_client.get("/advice")
+    blocking_total = time.perf_counter() - started
+
+    first_chunk = total = None
+    text, last_event = "", None
+    # The test client runs the view up to the first chunk inside get(), so time from before it
+    started = time.perf_counter()
+    response = streaming_client.get("/advice/stream", buffered=False)
+    for event, data, elapsed in read_events(response, started):
+        if event == "chunk":
+            text += data["text"]
+            first_chunk = first_chunk or elapsed
+        last_event, total = event, elapsed
+    response.close()
+
+    print(f"/advice         total {blocking_total:.2f}s")
+    print(f"/advice/stream  first chunk {first_chunk:.2f}s, total {total:.2f}s "
+          f"({first_chunk / blocking_total:.0%} of the blocking latency)")
+    if text != fake.text or last_event != "done":
+        raise SystemExit(f"Stream mismatch: ended with {last_event!r}, {len(text)} of {len(fake.text)} characters")
+    print(f"stream complete: {len(fake.chunks)} chunks, {len(text)} characters, ended with 'done'")
+
+if __name__ == "__main__":
+    main()
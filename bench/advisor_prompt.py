@@ -0,0 +1,39 @@
+"""
+Shows that the advisor prompt's size and build time stay flat as a user's
+history grows, from 100 to 100k transactions.
+
+    python -m bench.advisor_prompt [--sizes 100 1000 10000 100000] [--repeat 5]
+"""
+import time
+import argparse
+
+from bench.common import make_app, register, seed_transactions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5, help="Builds per size; the fastest is reported.")
+    args = parser.parse_args()
+
+    from board import advisor, db
+    from board.models import Goal, User
+
+    app = make_app()
+    print(f"{'transactions':>12} {'chars':>7} {'tokens':>7} {'build ms':>9}")
+    for size in args.sizes:
+        user_id, _ = register(app, f"user{size}")
+        seed_transactions(app, user_id, size)
+        with app.app_context():
+            db.session.add(Goal(user_id=user_id, name="Emergency fund", target_amount=50000, current_amount=12000, priority=60))
+            db.session.commit()
+
+            user = db.session.get(User, user_id)
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                prompt = advisor.build_full_prompt(user, app.config["ADVICE_PROMPT_TOKEN_BUDGET"])
+                timings.append(time.perf_counter() - started)
+        print(f"{size:>12,} {len(prompt):>7,} {advisor.estimate_tokens(prompt):>7,} {min(timings) * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Helpers shared by the benchmarks: a throwaway app, users and seeded history."""
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+DESCRIPTIONS = [
+    "Jollibee lunch", "Grab to office", "Puregold groceries", "Meralco bill", "Shopee order", "Netflix",
+    "Mercury Drug", "Rent", "Starbucks", "Shell gasoline", "PLDT internet", "Tuition", "7-Eleven snacks",
+]
+
+def make_app(workdir=None, sqlite_pragmas=None):
+    """
+    Creates the app with a fresh SQLite database in workdir (a new temporary
+    directory by default) and creates the tables. The process's working
+    directory changes to workdir, since the instance folder lives under it.
+
+    Args:
+        sqlite_pragmas (dict): Replaces the default SQLite pragmas (pass {}
+            to benchmark an untuned database).
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="smartspend-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("FLASK_SECRET_KEY", "bench")
+    # Always benchmark the throwaway SQLite database, never a configured one
+    os.environ.pop("SQLALCHEMY_DATABASE_URI", None)
+    os.environ.pop("DATABASE_URL", None)
+
+    from board import db_config
+    if sqlite_pragmas is not None:
+        db_config.DEFAULT_SQLITE_PRAGMAS = sqlite_pragmas
+
+    from board import create_app, db
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+def register(app, username):
+    """Registers a user and returns (user id, a test client logged in as them)."""
+    from board.models import User
+
+    client = app.test_client()
+    client.post("/register", data=dict(
+        username=username, password="bench", full_name=username.title(), email=f"{username}@example.com",
+        date_of_birth="1995-01-01", age="30", income_source="Salary"
+    ))
+    with app.app_context():
+        user_id = User.query.filter_by(username=username).one().id
+    return user_id, client
+
+def login(app, username):
+    """Returns a test client logged in as an existing user."""
+    client = app.test_client()
+    client.post("/login", data=dict(username=username, password="bench"))
+    return client
+
+def seed_transactions(app, user_id, count, days=365, seed=0, chunk_size=10000):
+    """Adds count random transactions spread over the last days days through the ledger."""
+    from board import db, ledger
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with app.app_context():
+        for start in range(0, count, chunk_size):
+            ledger.add_transactions(user_id, [
+                {
+                    "type": "income" if rng.random() < 0.15 else "expense",
+                    "amount": rng.randint(100, 500000) / 100,
+                    "description": rng.choice(DESCRIPTIONS),
+                    "source": "Bench",
+                    "created_at": now - timedelta(seconds=rng.randint(0, days * 24 * 60 * 60)),
+                }
+                for _ in range(min(chunk_size, count - start))
+            ])
+            db.session.commit()
@@ -0,0 +1,60 @@
+"""
+Compares what the dashboard charts cost before and after server-side
+aggregation, at 1k, 10k and 100k transactions per user.
+
+Before, the page embedded every transaction and the browser reduced them;
+now it fetches three pre-aggregated series. For each size this prints the
+bytes sent and the server time for both, and the number of points the
+browser has to draw (what its render time scales with).
+
+    python -m bench.dashboard_payload [--sizes 1000 10000 100000]
+"""
+import time
+import argparse
+from datetime import datetime, timedelta
+
+from bench.common import make_app, register, seed_transactions
+
+def embedded_payload(app, user_id):
+    # What the page used to ship: every transaction as JSON
+    from board.models import Transaction
+
+    started = time.perf_counter()
+    with app.app_context():
+        body = app.json.dumps([t.to_dict() for t in Transaction.query.filter_by(user_id=user_id).all()])
+    return len(body.encode()), time.perf_counter() - started
+
+def aggregated_payload(client):
+    # What the page fetches now, with the same window it asks for
+    start = (datetime.utcnow() - timedelta(days=89)).date().isoformat()
+    urls = ["/api/reports/categories", f"/api/reports/daily?start={start}", f"/api/reports/balance?start={start}"]
+
+    size = points = 0
+    started = time.perf_counter()
+    for url in urls:
+        response = client.get(url)
+        size += len(response.data)
+        data = response.get_json()
+        points += len(data) if isinstance(data, list) else len(data["dates"]) + len(data["forecast"]["dates"])
+    return size, time.perf_counter() - started, points
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    app = make_app()
+    print(f"{'transactions':>12}  {'embedded':>10} {'ms':>7}  {'aggregated':>10} {'ms':>7} {'points':>7}")
+    for size in args.sizes:
+        user_id, client = register(app, f"user{size}")
+        seed_transactions(app, user_id, size)
+
+        before_bytes, before_time = embedded_payload(app, user_id)
+        after_bytes, after_time, points = aggregated_payload(client)
+        print(
+            f"{size:>12,}  {before_bytes / 1024:>8.0f}KB {before_time * 1000:>7.1f}  "
+            f"{after_bytes / 1024:>8.1f}KB {after_time * 1000:>7.1f} {points:>7}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""A stand-in for the genai client that produces advice at a steady, configurable pace."""
+import time
+from types import SimpleNamespace
+
+ADVICE = (
+    "## Your budget at a glance\n\n"
+    "You spent most on **food and transport** this month. A few ideas:\n\n"
+    "1. Set a weekly food budget and track it in SmartSpend.\n"
+    "2. Batch errands to cut ride-hailing costs.\n"
+    "3. Move the difference into your emergency fund goal.\n"
+)
+
+class FakeGeminiClient:
+    """
+    Mimics client.models.generate_content and generate_content_stream.
+    The first chunk arrives after first_chunk_delay seconds and each
+    further chunk chunk_delay seconds later. The non-streaming call returns
+    once the whole text would have been generated.
+    """
+
+    def __init__(self, text=ADVICE, chunk_size=24, first_chunk_delay=0.4, chunk_delay=0.1):
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_delay = chunk_delay
+        self.models = self
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def generate_content_stream(self, model, contents):
+        for index, chunk in enumerate(self.chunks):
+            time.sleep(self.first_chunk_delay if index == 0 else self.chunk_delay)
+            yield SimpleNamespace(text=chunk)
+
+    def generate_content(self, model, contents):
+        return SimpleNamespace(text="".join(chunk.text for chunk in self.generate_content_stream(model, contents)))
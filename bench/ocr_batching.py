@@ -0,0 +1,54 @@
+"""
+Measures batched OCR throughput with and without receipt cropping, and how
+many images each readtext_batched call receives.
+
+    python -m bench.ocr_batching --images 32 --batch-size 8
+
+Needs EasyOCR installed (or OCR_SERVER_ADDRESS pointing at `flask ocr serve`).
+"""
+import argparse
+import time
+from collections import Counter
+
+from board import ocr_utils
+from board.ocr_utils import DEFAULT_PREPROCESS, process_images_batched
+from bench.receipts import receipt_photos
+
+def run(images, batch_size, preprocess):
+    batch_sizes = Counter()
+    call_reader = ocr_utils._call_reader
+
+    def counting_call_reader(method, *args):
+        if method == "readtext_batched":
+            batch_sizes[len(args[0])] += 1
+        return call_reader(method, *args)
+
+    ocr_utils._call_reader = counting_call_reader
+    try:
+        started = time.perf_counter()
+        process_images_batched(images, batch_size, preprocess)
+        elapsed = time.perf_counter() - started
+    finally:
+        ocr_utils._call_reader = call_reader
+    return elapsed, batch_sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    images = receipt_photos(args.images)
+    # Load the model up front so it isn't counted against the first run
+    ocr_utils._call_reader("readtext", images[0])
+
+    for crop in (False, True):
+        elapsed, batch_sizes = run(images, args.batch_size, dict(DEFAULT_PREPROCESS, crop=crop))
+        calls = sum(batch_sizes.values())
+        print(
+            f"crop={crop!s:5}  {len(images) / elapsed:6.2f} images/s  "
+            f"{calls} inference call(s), mean batch {len(images) / max(calls, 1):.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures app start-up time and peak memory (RSS) with the EasyOCR reader
+loaded lazily, as it is now, against loading it at start-up, as importing
+ocr_utils used to. With OCR_SERVER_ADDRESS and OCR_SERVER_AUTHKEY set (and
+`flask ocr serve` running), it also measures a worker that scans a receipt
+through the shared server instead of holding its own copy of the model.
+
+Each case runs in a fresh process.
+
+    python -m bench.ocr_startup
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+
+CASES = {
+    "lazy": "create_app; no scan",
+    "eager": "create_app, then load the reader (the old import-time cost)",
+    "remote": "create_app, then scan one receipt on the OCR server",
+}
+
+def child(case):
+    started = time.perf_counter()
+    from bench.common import make_app
+    make_app()
+    startup = time.perf_counter() - started
+
+    from board import ocr_utils
+    if case == "eager":
+        if ocr_utils.get_reader() is None:
+            sys.exit("EasyOCR couldn't be loaded; install it to measure the eager case.")
+    elif case == "remote":
+        from bench.receipts import receipt_photos
+        ocr_utils.process_image_for_ocr(receipt_photos(1)[0], ocr_utils.DEFAULT_PREPROCESS)
+
+    print(json.dumps({
+        "startup": startup,
+        "total": time.perf_counter() - started,
+        # ru_maxrss is in kilobytes on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+def run(case):
+    env = dict(os.environ)
+    if case != "remote":
+        env.pop("OCR_SERVER_ADDRESS", None)
+    process = subprocess.run(
+        [sys.executable, "-m", "bench.ocr_startup", "--child", case],
+        env=env, capture_output=True, text=True, cwd=os.getcwd()
+    )
+    if process.returncode:
+        raise SystemExit(f"{case}: {process.stderr.strip().splitlines()[-1]}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    cases = ["lazy", "eager"]
+    if os.getenv("OCR_SERVER_ADDRESS"):
+        cases.append("remote")
+    for case in cases:
+        result = run(case)
+        print(
+            f"{case:6}  start-up {result['startup']:5.2f}s  total {result['total']:6.2f}s  "
+            f"peak RSS {result['rss_mb']:7.1f} MB  ({CASES[case]})"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Compares OCR throughput of the sequential loop (one readtext call per
+receipt) with the batched path a multi-receipt upload takes (concurrent
+decoding and readtext_batched).
+
+    python -m bench.ocr_throughput --images 32 --batch-size 8
+
+Needs EasyOCR installed (or OCR_SERVER_ADDRESS pointing at `flask ocr serve`).
+"""
+import time
+import argparse
+
+from board.ocr_utils import DEFAULT_PREPROCESS, process_image_for_ocr, process_images_batched
+from bench.receipts import receipt_photos
+
+def sequential(images, preprocess):
+    return [process_image_for_ocr(image, preprocess) for image in images]
+
+def batched(images, preprocess, batch_size):
+    return process_images_batched(images, batch_size, preprocess)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    images = receipt_photos(args.images)
+    preprocess = dict(DEFAULT_PREPROCESS)
+    # Load the model up front so it isn't counted against the first run
+    process_image_for_ocr(images[0], preprocess)
+
+    rates = {}
+    for name, run in (("sequential", lambda: sequential(images, preprocess)),
+                      ("batched", lambda: batched(images, preprocess, args.batch_size))):
+        started = time.perf_counter()
+        run()
+        rates[name] = len(images) / (time.perf_counter() - started)
+        print(f"{name:10}  {rates[name]:6.2f} images/s")
+    print(f"speed-up    {rates['batched'] / rates['sequential']:6.2f}x")
+
+if __name__ == "__main__":
+    main()
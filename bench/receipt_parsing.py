@@ -0,0 +1,78 @@
+"""
+Tracks the receipt parser's accuracy and throughput.
+
+Every receipt in bench/data/receipts.json is parsed and compared with its
+expected transactions; the parser is then timed over the corpus and over
+adversarial input (maximum-length lines of digits and separators).
+
+    python -m bench.receipt_parsing [--repeat 2000] [--check]
+"""
+import os
+import json
+import time
+import argparse
+
+from board.ocr_utils import parse_transaction_from_text, MAX_LINES, MAX_LINE_LENGTH
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "receipts.json")
+
+def transactions(text):
+    return sorted((tx["type"], tx["amount"]) for tx in parse_transaction_from_text(text) or [])
+
+def accuracy(corpus):
+    """Returns (receipts parsed exactly, precision, recall, failures) over the corpus."""
+    exact = true_positives = found = expected_count = 0
+    failures = []
+    for receipt in corpus:
+        expected = sorted(tuple(tx) for tx in receipt["expected"])
+        actual = transactions(receipt["text"])
+        remaining = list(expected)
+        for tx in actual:
+            if tx in remaining:
+                remaining.remove(tx)
+                true_positives += 1
+        found += len(actual)
+        expected_count += len(expected)
+        if actual == expected:
+            exact += 1
+        else:
+            failures.append((receipt["name"], expected, actual))
+
+    precision = true_positives / found if found else 1.0
+    recall = true_positives / expected_count if expected_count else 1.0
+    return exact, precision, recall, failures
+
+def throughput(texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            parse_transaction_from_text(text)
+    return repeat * len(texts) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="Passes over the corpus when timing.")
+    parser.add_argument("--check", action="store_true", help="Exit with an error if any receipt is misparsed.")
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    exact, precision, recall, failures = accuracy(corpus)
+    print(f"accuracy: {exact}/{len(corpus)} receipts exact, precision {precision:.3f}, recall {recall:.3f}")
+    for name, expected, actual in failures:
+        print(f"  {name}: expected {expected}, got {actual}")
+
+    rate = throughput([receipt["text"] for receipt in corpus], args.repeat)
+    print(f"throughput: {rate:,.0f} receipts/s")
+
+    adversarial = "\n".join(("1,2" * MAX_LINE_LENGTH)[:MAX_LINE_LENGTH * 5] for _ in range(MAX_LINES * 3))
+    started = time.perf_counter()
+    parse_transaction_from_text(adversarial)
+    print(f"adversarial: {len(adversarial):,} chars in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    if args.check and failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
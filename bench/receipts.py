@@ -0,0 +1,42 @@
+"""Synthetic receipt photos for the OCR benchmarks."""
+import random
+import cv2
+import numpy as np
+
+LINES = [
+    "JOLLIBEE - SM NORTH EDSA", "TIN 000-123-456-000", "OR No. 004512", "08/14/2025 12:41 PM",
+    "1 Chickenjoy 1pc      99.00", "1 Jolly Spaghetti     70.00", "1 Coke Float          55.00",
+    "SUBTOTAL             224.00", "VATable Sales        200.00", "VAT 12%               24.00",
+    "TOTAL                224.00", "CASH                 500.00", "CHANGE               276.00",
+]
+
+def receipt_photo(rng, width=None, height=None):
+    """
+    Draws a receipt (white paper with printed lines) on a darker table
+    background, at a random size, position and slight rotation, the way a
+    phone photo frames it.
+
+    Returns:
+        bytes: The photo, JPEG encoded.
+    """
+    width = width or rng.randint(900, 1400)
+    height = height or rng.randint(1200, 1900)
+    photo = np.full((height, width, 3), rng.randint(40, 110), dtype=np.uint8)
+
+    paper_w, paper_h = int(width * rng.uniform(0.45, 0.75)), int(height * rng.uniform(0.6, 0.9))
+    paper = np.full((paper_h, paper_w, 3), 245, dtype=np.uint8)
+    for i, line in enumerate(LINES):
+        y = 50 + i * (paper_h - 80) // len(LINES)
+        cv2.putText(paper, line, (20, y), cv2.FONT_HERSHEY_SIMPLEX, paper_w / 900, (20, 20, 20), 2)
+
+    matrix = cv2.getRotationMatrix2D((paper_w / 2, paper_h / 2), rng.uniform(-6, 6), 1.0)
+    paper = cv2.warpAffine(paper, matrix, (paper_w, paper_h), borderValue=(245, 245, 245))
+    x, y = rng.randint(0, width - paper_w), rng.randint(0, height - paper_h)
+    photo[y:y + paper_h, x:x + paper_w] = paper
+
+    return cv2.imencode(".jpg", photo)[1].tobytes()
+
+def receipt_photos(count, seed=0, width=1200, height=1600):
+    """Returns count receipt photos taken at one camera resolution, as from the same phone."""
+    rng = random.Random(seed)
+    return [receipt_photo(rng, width, height) for _ in range(count)]
@@ -0,0 +1,107 @@
+"""
+Concurrent-writer load test for the SQLite tuning. Writer processes add
+transactions through POST /add while reader processes stream CSV exports,
+for --duration seconds. It runs once against an untuned database (rollback
+journal, default pragmas) and once with the app's WAL pragmas, and reports
+writes/s, write latency, completed exports and errors such as
+"database is locked".
+
+    python -m bench.sqlite_writers [--writers 8] [--readers 4] [--duration 30] [--history 20000]
+"""
+import time
+import argparse
+import tempfile
+import multiprocessing
+from collections import Counter
+
+from bench.common import make_app, register, login, seed_transactions
+
+def _error(e):
+    return f"{type(e).__name__}: {str(e).splitlines()[0][:60]}"
+
+def writer(workdir, pragmas, ready, start, stop, results):
+    client = login(make_app(workdir, pragmas), "writer")
+    ready.release()
+    start.wait()
+    latencies, errors = [], []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = client.post("/add", data={"type": "expense", "amount": "12.50", "description": "Load test"})
+            if response.status_code != 302:
+                errors.append(f"HTTP {response.status_code}")
+        except Exception as e:
+            errors.append(_error(e))
+        latencies.append(time.perf_counter() - started)
+    results.put(("writer", latencies, errors))
+
+def reader(workdir, pragmas, ready, start, stop, results):
+    client = login(make_app(workdir, pragmas), "writer")
+    ready.release()
+    start.wait()
+    exports, errors = 0, []
+    while not stop.is_set():
+        try:
+            response = client.get("/api/transactions/export?format=csv", buffered=False)
+            for _ in response.response:
+                pass
+            response.close()
+            exports += 1
+        except Exception as e:
+            errors.append(_error(e))
+    results.put(("reader", exports, errors))
+
+def run(label, pragmas, args):
+    workdir = tempfile.mkdtemp(prefix=f"smartspend-load-{label}-")
+    app = make_app(workdir, pragmas)
+    user_id, _ = register(app, "writer")
+    seed_transactions(app, user_id, args.history)
+
+    context = multiprocessing.get_context("spawn")
+    ready, start, stop, results = context.Semaphore(0), context.Event(), context.Event(), context.Queue()
+    processes = [context.Process(target=writer, args=(workdir, pragmas, ready, start, stop, results))
+                 for _ in range(args.writers)]
+    processes += [context.Process(target=reader, args=(workdir, pragmas, ready, start, stop, results))
+                  for _ in range(args.readers)]
+    for process in processes:
+        process.start()
+    # Start everyone together once each process has built its app
+    for _ in processes:
+        ready.acquire()
+
+    start.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for kind, values, _ in outcomes if kind == "writer" for latency in values)
+    errors = Counter(error for _, _, process_errors in outcomes for error in process_errors)
+    writes = len(latencies) - sum(len(e) for kind, _, e in outcomes if kind == "writer")
+    exports = sum(values for kind, values, _ in outcomes if kind == "reader")
+
+    print(
+        f"{label:8} {writes:>6} writes ({writes / elapsed:5.1f}/s)  p50 {latencies[len(latencies) // 2] * 1000:6.0f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.0f} ms  {exports:>4} exports  {sum(errors.values()):>5} errors"
+    )
+    for error, count in errors.most_common(3):
+        print(f"           {count}x {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per configuration.")
+    parser.add_argument("--history", type=int, default=20000, help="Transactions the readers export.")
+    args = parser.parse_args()
+
+    from board.db_config import DEFAULT_SQLITE_PRAGMAS
+    print(f"{args.writers} writer(s), {args.readers} reader(s), {args.duration:g}s each, {args.history:,} transactions")
+    run("untuned", {}, args)
+    run("tuned", dict(DEFAULT_SQLITE_PRAGMAS), args)
+
+if __name__ == "__main__":
+    main()
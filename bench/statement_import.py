@@ -0,0 +1,88 @@
+"""
+Measures statement import throughput (rows/s) for CSV and OFX, the rate of
+re-importing a statement that is already recorded (every row a duplicate),
+and the peak memory each allocates, which should not grow with the size of
+the file.
+
+    python -m bench.statement_import [--sizes 5000 50000] [--chunk-size 1000]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+from bench.common import make_app, register
+
+def write_csv(path, rows, seed=0):
+    # Debit/credit columns, dates out of order, quoted descriptions with commas
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Date,Description,Debit,Credit\n")
+        for i in range(rows):
+            day = f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.choice((2023, 2024))}"
+            if i % 4 == 0:
+                f.write(f'{day},"Payroll {i % 97}, Inc",,"{rng.randint(1000, 5000000) / 100:,.2f}"\n')
+            else:
+                f.write(f'{day},"Shop {i % 500}, Makati","{rng.randint(100, 999999) / 100:,.2f}",\n')
+
+def write_ofx(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n")
+        for i in range(rows):
+            amount = rng.randint(100, 999999) / 100 * (1 if i % 4 == 0 else -1)
+            f.write(
+                f"<STMTTRN><TRNTYPE>{'CREDIT' if amount > 0 else 'DEBIT'}<DTPOSTED>2024{rng.randint(1, 12):02d}"
+                f"{rng.randint(1, 28):02d}120000<TRNAMT>{amount:.2f}<FITID>{i}<NAME>MERCHANT {i % 500}</STMTTRN>\n"
+            )
+        f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+def timed_import(app, user_id, path, fmt, chunk_size, trace=False):
+    from board import importer
+
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with app.app_context(), open(path, "rb") as statement:
+        result = importer.import_statement(user_id, statement, fmt, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = make_app()
+    workdir = tempfile.mkdtemp(prefix="smartspend-statements-")
+    print(f"{'format':6} {'rows':>8} {'import rows/s':>14} {'re-import rows/s':>17} {'peak MB':>8} {'re-import peak MB':>18}")
+    for fmt, write in (("csv", write_csv), ("ofx", write_ofx)):
+        for size in args.sizes:
+            path = os.path.join(workdir, f"statement-{size}.{fmt}")
+            write(path, size)
+
+            user_id, _ = register(app, f"{fmt}{size}")
+            result, elapsed, _ = timed_import(app, user_id, path, fmt, args.chunk_size)
+            assert result["imported"] == size, result
+            again, again_elapsed, _ = timed_import(app, user_id, path, fmt, args.chunk_size)
+            assert again["duplicates"] == size, again
+
+            # Memory is traced on a separate user, since tracing slows the import down
+            traced_user_id, _ = register(app, f"{fmt}{size}traced")
+            _, _, peak = timed_import(app, traced_user_id, path, fmt, args.chunk_size, trace=True)
+            _, _, again_peak = timed_import(app, traced_user_id, path, fmt, args.chunk_size, trace=True)
+
+            print(
+                f"{fmt:6} {size:>8,} {size / elapsed:>14,.0f} {size / again_elapsed:>17,.0f} "
+                f"{peak / 1024 / 1024:>8.1f} {again_peak / 1024 / 1024:>18.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
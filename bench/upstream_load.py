@@ -0,0 +1,135 @@
+"""
+Load test for the upstream bulkheads. A local stub stands in for the Gemini
+API and answers after --delay seconds. The app is served by a threaded
+WSGI server with a tight Gemini limit, and --requests concurrent /advice
+calls are fired at it. Meanwhile a fast route is polled to show it keeps
+answering while Gemini is slow.
+
+    python -m bench.upstream_load [--delay 3] [--requests 8] [--max-concurrent 2] [--timeout 1]
+"""
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from google import genai
+from google.genai import types
+from werkzeug.serving import make_server
+
+from bench.common import make_app, register, seed_transactions
+
+STUB_RESPONSE = {
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "Spend less on coffee."}]}, "finishReason": "STOP"}]
+}
+
+def start_stub(state):
+    """Starts a stub Gemini API that answers every request after state["delay"] seconds; returns its base URL."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(state["delay"])
+            body = json.dumps(STUB_RESPONSE).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+def start_app(stub_url, max_concurrent, timeout, users):
+    """Serves the app with its Gemini bulkhead limited and pointed at the stub; returns (base URL, usernames)."""
+    from board.upstreams import upstreams
+
+    app = make_app()
+    app.config["UPSTREAM_LIMITS"] = {
+        "gemini": {"max_concurrent": max_concurrent, "timeout": timeout},
+        "market_data": {"max_concurrent": 8, "timeout": 20},
+    }
+    upstreams.init_app(app)
+    app.config["API_CLIENT"] = genai.Client(
+        api_key="bench", http_options=types.HttpOptions(base_url=stub_url, timeout=int(timeout * 1000) + 5000)
+    )
+
+    # One user per request so no request is answered from the advice cache
+    usernames = []
+    for i in range(users):
+        user_id, _ = register(app, f"load{i}")
+        seed_transactions(app, user_id, 50)
+        usernames.append(f"load{i}")
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", usernames
+
+def session_for(base_url, username):
+    session = requests.Session()
+    session.post(f"{base_url}/login", data={"username": username, "password": "bench"})
+    return session
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--delay", type=float, default=3, help="Seconds the stub Gemini takes to answer.")
+    parser.add_argument("--requests", type=int, default=8, help="Concurrent /advice requests.")
+    parser.add_argument("--max-concurrent", type=int, default=2, help="Gemini bulkhead slots.")
+    parser.add_argument("--timeout", type=float, default=1, help="Gemini bulkhead timeout in seconds.")
+    args = parser.parse_args()
+
+    stub = {"delay": args.delay}
+    stub_url = start_stub(stub)
+    base_url, usernames = start_app(stub_url, args.max_concurrent, args.timeout, args.requests)
+    sessions = [session_for(base_url, username) for username in usernames]
+
+    # Poll a route that doesn't touch Gemini while the advice requests are in flight
+    probe_latencies = []
+    stop = threading.Event()
+
+    def probe():
+        probe_session = session_for(base_url, usernames[0])
+        while not stop.is_set():
+            started = time.perf_counter()
+            probe_session.get(f"{base_url}/api/reports/daily")
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    def ask(session):
+        started = time.perf_counter()
+        response = session.get(f"{base_url}/advice")
+        return response.status_code, time.perf_counter() - started
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    with ThreadPoolExecutor(max_workers=args.requests) as pool:
+        results = list(pool.map(ask, sessions))
+    stop.set()
+    prober.join()
+
+    print(f"stub delay {args.delay}s, bulkhead {args.max_concurrent} slot(s) / {args.timeout}s timeout")
+    for status, count in sorted(Counter(status for status, _ in results).items()):
+        latencies = sorted(elapsed for s, elapsed in results if s == status)
+        print(f"/advice {status}: {count} request(s), {latencies[0]:.2f}-{latencies[-1]:.2f}s")
+    probe_latencies.sort()
+    print(
+        f"/api/reports/daily during the load: {len(probe_latencies)} request(s), "
+        f"p50 {probe_latencies[len(probe_latencies) // 2] * 1000:.0f} ms, max {probe_latencies[-1] * 1000:.0f} ms"
+    )
+
+    # Once the hung calls return, their slots free up and a healthy Gemini is reachable again
+    stub["delay"] = 0
+    time.sleep(args.delay)
+    status, elapsed = ask(session_for(base_url, usernames[-1]))
+    print(f"/advice once the stub answers promptly: {status} in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
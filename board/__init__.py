@@ -2,6 +2,7 @@ import os
 from flask import Flask, session
 from dotenv import load_dotenv
 from google import genai
+from google.genai import types
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
@@ -21,6 +22,9 @@ MODEL_ID = "gemini-2.5-flash-lite"
 
 def create_app():
     app = Flask(__name__, instance_path=os.path.join(os.getcwd(), 'var', 'board-instance'))
+    # Money columns come back as Decimals; send them to the browser as plain numbers
+    from board.money import JSONProvider
+    app.json = JSONProvider(app)
     app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY')
     app.config['API_KEY'] = os.getenv('SECRET_API_KEY')
     app.config['MODEL_ID'] = MODEL_ID
@@ -32,22 +36,48 @@ def create_app():
     os.makedirs(upload_folder, exist_ok=True)
     app.config["UPLOAD_FOLDER"] = upload_folder
 
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(app.instance_path, "app.db")
+    # The database URI can come from the environment; SQLite connections get WAL and a busy timeout
+    from board import db_config
+    db_config.init_app(app)
 
     db.init_app(app)
+    db_config.apply_pragmas(app, db)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'pages.login'
 
     from . import models
 
+    from board.ocr_jobs import ocr_queue
+    ocr_queue.init_app(app)
+
+    from board.market_data import market_data
+    market_data.init_app(app)
+
+    from board.fx_rates import fx_rates
+    fx_rates.init_app(app)
+
+    from board.upstreams import upstreams
+    upstreams.init_app(app)
+
+    from board.advisor import advice_cache
+    advice_cache.init_app(app)
+
     @login_manager.user_loader
     def load_user(user_id):
         return models.User.query.get(int(user_id))
     
-    app.config['API_CLIENT'] = genai.Client(api_key=app.config['API_KEY'])
+    # The client keeps one pooled HTTP connection set for the whole app; the timeout is in milliseconds
+    gemini_timeout = app.config["UPSTREAM_LIMITS"]["gemini"]["timeout"]
+    app.config['API_CLIENT'] = genai.Client(
+        api_key=app.config['API_KEY'],
+        http_options=types.HttpOptions(timeout=int(gemini_timeout * 1000))
+    )
 
     from board.pages import bp
     app.register_blueprint(bp)
+
+    from board import commands
+    commands.init_app(app)
     
     return app
@@ -0,0 +1,341 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import func
+
+from board.models import db, Transaction, Goal, DailyRollup
+from board import ledger, reports
+
+# Beyond this many new transactions a delta prompt is no smaller than a fresh one
+MAX_DELTA_TRANSACTIONS = 200
+
+def fingerprint(user, count, last_transaction_id, totals, goals=()):
+    """
+    Returns a hash of everything the advice depends on: the user's
+    transaction set (count, newest id and running totals), goals and profile.
+    """
+    income, expense = totals
+    state = f"{count}:{last_transaction_id}:{income:.2f}:{expense:.2f}:{user.full_name}:{user.income_source}:{user.age}"
+    for goal in goals:
+        state += f":{goal.id},{goal.current_amount:.2f},{goal.target_amount:.2f},{goal.priority}"
+    return hashlib.sha256(state.encode()).hexdigest()
+
+# Rough size of a token for budgeting purposes; Gemini averages about four characters per token
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 1500
+# Most a delta prompt spends on quoting the earlier advice, so the new transactions still fit
+PREVIOUS_ADVICE_SHARE = 0.4
+TREND_MONTHS = 6
+TOP_MERCHANTS = 10
+MERCHANT_WINDOW_DAYS = 90
+RECENT_TRANSACTIONS = 10
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def fit_sections(sections, token_budget, header=(), footer=()):
+    """
+    Joins prompt sections in priority order, dropping trailing lines (and
+    then whole sections) once the token budget is spent. The header and
+    footer lines are always kept, and their share of the budget is set
+    aside first.
+
+    Args:
+        sections (list): (heading, [line, ...]) pairs, most important first.
+
+    Returns:
+        str: The prompt.
+    """
+    parts = list(header)
+    remaining = token_budget - sum(estimate_tokens(line) for line in (*header, *footer))
+    for heading, lines in sections:
+        # Skip the section unless its heading and at least one line fit
+        if not lines or estimate_tokens(heading) + estimate_tokens(lines[0]) > remaining:
+            continue
+
+        parts.append(heading)
+        remaining -= estimate_tokens(heading)
+        for line in lines:
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                break
+            parts.append(line)
+            remaining -= cost
+    parts.extend(footer)
+    return "\n".join(parts)
+
+def profile_info(user):
+    return (
+        f"My name is {user.full_name}, and my source of income is {user.income_source}. "
+        f"I am {user.age} years old."
+    )
+
+def _money(amount):
+    return f"₱{amount:,.2f}"
+
+def _transaction_line(t):
+    return f"- {t.created_at:%Y-%m-%d} {t.type} {_money(t.amount)} ({t.description})"
+
+def _goal_lines(goals):
+    return [
+        f"- {goal.name}: {_money(goal.current_amount)} of {_money(goal.target_amount)} "
+        f"({goal.current_amount / goal.target_amount:.0%}, priority {goal.priority}%)"
+        for goal in sorted(goals, key=lambda goal: goal.priority, reverse=True)
+        if goal.target_amount
+    ]
+
+def _truncate(text, token_budget):
+    # Cuts text to roughly token_budget tokens, at a line break when there is one in the second half
+    limit = token_budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", limit // 2, limit)
+    return text[:cut if cut != -1 else limit].rstrip() + "\n[...]"
+
+def monthly_trends(user_id, months=TREND_MONTHS):
+    """
+    Sums income and expenses per calendar month from the daily rollups, so
+    the cost depends on the number of days covered, not on transactions.
+
+    Returns:
+        list: ("YYYY-MM", income, expense) tuples, oldest first.
+    """
+    today = datetime.utcnow().date()
+    first = today.replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+
+    totals = {}
+    rollups = db.session.query(DailyRollup.day, DailyRollup.income, DailyRollup.expense) \
+        .filter(DailyRollup.user_id == user_id, DailyRollup.day >= first).all()
+    for day, income, expense in rollups:
+        month = totals.setdefault(day.strftime("%Y-%m"), [0, 0])
+        month[0] += income
+        month[1] += expense
+    return [(month, income, expense) for month, (income, expense) in sorted(totals.items())]
+
+def summary_sections(user):
+    """
+    Summarizes a user's finances with aggregate queries: overall totals
+    (from the ledger), monthly trends (from the daily rollups), top merchants
+    over a recent window, goal progress and the latest transactions. Each
+    piece is bounded, so neither the summary's size nor the work to build it
+    grows with the length of the history.
+
+    Returns:
+        list: (heading, lines) sections for fit_sections, most important first.
+    """
+    income, expense = ledger.get_totals(user.id)
+    today = datetime.utcnow().date()
+
+    totals = [
+        f"- Income: {_money(income)}",
+        f"- Expenses: {_money(expense)}",
+        f"- Balance: {_money(income - expense)}",
+    ]
+    trends = [
+        f"- {month}: income {_money(month_income)}, expenses {_money(month_expense)}, net {_money(month_income - month_expense)}"
+        for month, month_income, month_expense in reversed(monthly_trends(user.id))
+    ]
+    merchants = [
+        f"- {row['description']}: {_money(row['total'])}"
+        for row in reports.expense_breakdown(user.id, start=today - timedelta(days=MERCHANT_WINDOW_DAYS), limit=TOP_MERCHANTS)
+    ]
+    goals = _goal_lines(Goal.query.filter_by(user_id=user.id).all())
+    recent = [
+        _transaction_line(t) for t in Transaction.query.filter_by(user_id=user.id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(RECENT_TRANSACTIONS)
+    ]
+
+    return [
+        ("My totals:", totals),
+        ("Monthly trend (newest first):", trends),
+        (f"Where my money went in the last {MERCHANT_WINDOW_DAYS} days (largest expenses by description):", merchants),
+        ("My savings goals:", goals),
+        ("My latest transactions:", recent),
+    ]
+
+def build_full_prompt(user, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Builds the prompt asking for advice from a bounded summary of the user's finances."""
+    return fit_sections(
+        summary_sections(user),
+        token_budget,
+        header=["Here is a summary of my finances."],
+        footer=[
+            "",
+            "Based on this summary, and the following personal information:",
+            profile_info(user),
+            "",
+            "Please give me some smart and personalized budgeting advice.",
+        ]
+    )
+
+def build_delta_prompt(user, entry, new_transactions, totals, goals=(), token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Builds a prompt that updates earlier advice with only what changed since
+    it was given, instead of resending the whole history. The earlier advice
+    is cut to PREVIOUS_ADVICE_SHARE of the budget.
+
+    Returns:
+        str: The prompt, or None if the new transactions don't all fit in
+        the budget (ask with build_full_prompt instead).
+    """
+    income, expense = totals
+    header = [
+        f"Earlier you gave me this budgeting advice:\n{_truncate(entry.text, int(token_budget * PREVIOUS_ADVICE_SHARE))}",
+        "",
+        f"Since then my total income went from {_money(entry.totals[0])} to {_money(income)} "
+        f"and my total expenses from {_money(entry.totals[1])} to {_money(expense)}.",
+    ]
+    footer = [
+        "",
+        "My personal information:",
+        profile_info(user),
+        "",
+        "Please update your smart and personalized budgeting advice to reflect these changes.",
+    ]
+    heading = "New transactions:"
+    lines = [_transaction_line(t) for t in new_transactions]
+    if sum(estimate_tokens(line) for line in (*header, *footer, heading, *lines)) > token_budget:
+        return None
+
+    return fit_sections(
+        [(heading, lines), ("My savings goals now:", _goal_lines(goals))],
+        token_budget,
+        header=header,
+        footer=footer
+    )
+
+class AdviceEntry:
+    __slots__ = ("fingerprint", "text", "html", "last_transaction_id", "totals", "created_at")
+
+    def __init__(self, fingerprint, text, html, last_transaction_id, totals, created_at):
+        self.fingerprint = fingerprint
+        self.text = text
+        self.html = html
+        self.last_transaction_id = last_transaction_id
+        self.totals = totals
+        self.created_at = created_at
+
+class AdviceCache:
+    """
+    Keeps each user's latest generated advice in memory. An entry is a hit
+    while the user's fingerprint is unchanged; after that it still serves as
+    the base for an incremental update until it is ADVICE_CACHE_TTL seconds
+    old. At most ADVICE_CACHE_MAX_ENTRIES users are kept, least recently used
+    first out.
+
+    Each process has its own cache, and stats() reports that process's
+    hit rate.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = None
+        self.max_entries = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "incremental": 0, "full": 0, "evictions": 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ADVICE_CACHE_TTL", 24 * 60 * 60)
+        app.config.setdefault("ADVICE_CACHE_MAX_ENTRIES", 1000)
+        app.config.setdefault("ADVICE_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+        app.extensions["advice_cache"] = self
+        self.ttl = app.config["ADVICE_CACHE_TTL"]
+        self.max_entries = app.config["ADVICE_CACHE_MAX_ENTRIES"]
+
+    def get(self, user_id):
+        """Returns the user's cached entry, or None if there is none or it has expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if time.time() - entry.created_at >= self.ttl:
+                del self._entries[user_id]
+                self._stats["evictions"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id, entry):
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def record(self, outcome):
+        """Counts a lookup outcome: "hits", "incremental" or "full"."""
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Lookup counts, the hit rate (cached answers over all
+            lookups) and the number of cached users.
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["incremental"] + self._stats["full"]
+            return {
+                **self._stats,
+                "lookups": lookups,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+advice_cache = AdviceCache()
+
+def plan(user, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Decides how to answer an advice request.
+
+    Returns:
+        tuple: (cached entry or None, prompt or None, state). A cached entry
+        with no prompt is a hit; otherwise Gemini has to be asked with the
+        prompt, which is incremental when a cached entry was usable as its
+        base. Pass state to remember() along with the answer.
+    """
+    count, last_id = db.session.query(func.count(Transaction.id), func.max(Transaction.id)) \
+        .filter(Transaction.user_id == user.id).one()
+    totals = ledger.get_totals(user.id)
+    goals = Goal.query.filter_by(user_id=user.id).order_by(Goal.id).all()
+    state = {
+        "fingerprint": fingerprint(user, count, last_id, totals, goals),
+        "last_transaction_id": last_id,
+        "totals": totals
+    }
+    entry = advice_cache.get(user.id)
+
+    if entry is not None and entry.fingerprint == state["fingerprint"]:
+        advice_cache.record("hits")
+        return entry, None, state
+
+    if entry is not None:
+        new_transactions = Transaction.query.filter(
+            Transaction.user_id == user.id, Transaction.id > (entry.last_transaction_id or 0)
+        ).order_by(Transaction.id).limit(MAX_DELTA_TRANSACTIONS + 1).all()
+        prompt = None
+        if len(new_transactions) <= MAX_DELTA_TRANSACTIONS:
+            prompt = build_delta_prompt(user, entry, new_transactions, totals, goals, token_budget)
+        if prompt is not None:
+            advice_cache.record("incremental")
+            return entry, prompt, state
+
+    advice_cache.record("full")
+    return None, build_full_prompt(user, token_budget), state
+
+def remember(user_id, state, text, html):
+    """Caches freshly generated advice (markdown text and rendered HTML) for the state it answered."""
+    advice_cache.put(user_id, AdviceEntry(
+        state["fingerprint"], text, html, state["last_transaction_id"], state["totals"], time.time()
+    ))
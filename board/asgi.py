@@ -0,0 +1,10 @@
+"""
+ASGI entry point, for serving the app with an ASGI server such as uvicorn:
+
+    uvicorn board.asgi:asgi_app --workers 2
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from board import create_app
+
+asgi_app = WsgiToAsgi(create_app())
@@ -0,0 +1,142 @@
+import re
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import event, select, update
+
+from board.models import db, Category, Transaction
+from board.reports import GOAL_DISTRIBUTION_PREFIX
+
+# Keywords are matched as whole words, case-insensitively, against the
+# description; the first category with a hit wins, so more specific ones go first.
+EXPENSE_RULES = {
+    "Groceries": ("grocery", "groceries", "supermarket", "puregold", "savemore", "sm market", "robinsons supermarket",
+                  "palengke", "market", "7-eleven", "7 eleven", "ministop", "alfamart", "sari-sari"),
+    "Food & Dining": ("food", "lunch", "dinner", "breakfast", "snack", "snacks", "coffee", "cafe", "restaurant",
+                      "jollibee", "mcdo", "mcdonald's", "mcdonalds", "kfc", "chowking", "starbucks", "grabfood",
+                      "foodpanda", "pizza", "milk tea", "bakery", "meal", "merienda"),
+    "Transport": ("grab", "angkas", "joyride", "taxi", "jeep", "jeepney", "tricycle", "bus", "mrt", "lrt", "train",
+                  "fare", "gas", "gasoline", "fuel", "diesel", "petron", "shell", "caltex", "parking", "toll",
+                  "autosweep", "easytrip"),
+    "Bills & Utilities": ("meralco", "electric", "electricity", "water", "maynilad", "manila water", "internet",
+                          "wifi", "pldt", "globe", "smart", "converge", "load", "postpaid", "phone", "bill", "bills"),
+    "Housing": ("rent", "rental", "dorm", "condo", "apartment", "association dues", "mortgage", "amortization"),
+    "Health": ("pharmacy", "mercury drug", "watsons", "medicine", "doctor", "clinic", "hospital", "dental",
+               "dentist", "checkup", "philhealth", "vitamins"),
+    "Shopping": ("shopee", "lazada", "zalora", "mall", "clothes", "shoes", "uniqlo", "h&m", "shopping", "gadget"),
+    "Entertainment": ("netflix", "spotify", "youtube", "disney", "movie", "movies", "cinema", "concert", "game",
+                      "games", "steam", "karaoke"),
+    "Education": ("tuition", "school", "books", "book", "course", "seminar", "training", "enrollment"),
+}
+INCOME_RULES = {
+    "Salary": ("salary", "payroll", "payslip", "wage", "wages", "13th month", "bonus", "allowance"),
+    "Business": ("sales", "sale", "client", "invoice", "freelance", "commission", "business", "payment"),
+    "Interest & Dividends": ("interest", "dividend", "dividends", "cashback", "rebate"),
+}
+
+# Goal distributions move money into savings, so they are neither spending nor income
+SAVINGS = "Savings & Goals"
+OTHER_EXPENSE = "Other Expenses"
+OTHER_INCOME = "Other Income"
+
+# Every category the matcher can return, as {name: kind}
+CATEGORIES = {
+    **{name: "expense" for name in EXPENSE_RULES},
+    OTHER_EXPENSE: "expense",
+    **{name: "income" for name in INCOME_RULES},
+    OTHER_INCOME: "income",
+    SAVINGS: "transfer",
+}
+
+def _compile(rules):
+    return [
+        (name, re.compile(r"(?<!\w)(?:" + "|".join(re.escape(k) for k in keywords) + r")(?!\w)", re.IGNORECASE))
+        for name, keywords in rules.items()
+    ]
+
+_EXPENSE_PATTERNS = _compile(EXPENSE_RULES)
+_INCOME_PATTERNS = _compile(INCOME_RULES)
+
+@lru_cache(maxsize=4096)
+def categorize(description, type):
+    """
+    Picks a category for a transaction from its description. Descriptions
+    repeat a lot (the same merchant, the same salary line), so results are
+    memoized.
+
+    Args:
+        description (str): The transaction description.
+        type (str): "income" or "expense".
+
+    Returns:
+        str: A category name from CATEGORIES.
+    """
+    description = description or ""
+    if type == "income":
+        patterns, fallback = _INCOME_PATTERNS, OTHER_INCOME
+    else:
+        if description.startswith(GOAL_DISTRIBUTION_PREFIX):
+            return SAVINGS
+        patterns, fallback = _EXPENSE_PATTERNS, OTHER_EXPENSE
+
+    for name, pattern in patterns:
+        if pattern.search(description):
+            return name
+    return fallback
+
+@event.listens_for(Category.__table__, "after_create")
+def _seed(table, connection, **kwargs):
+    # Databases built with create_all get the rows the migration seeds
+    connection.execute(table.insert(), [{"name": name, "kind": kind} for name, kind in CATEGORIES.items()])
+
+def category_ids():
+    """
+    Returns {name: id} for every category. The categories are seeded with
+    the table and never change at runtime, so the mapping is read once and
+    kept on the app.
+
+    Raises:
+        RuntimeError: If a category is missing (the database isn't migrated).
+    """
+    ids = current_app.extensions.get("category_ids")
+    if ids is None:
+        ids = dict(db.session.execute(select(Category.name, Category.id)).all())
+        missing = set(CATEGORIES) - set(ids)
+        if missing:
+            raise RuntimeError(f"Categories missing from the database: {', '.join(sorted(missing))}. Run `flask db upgrade`.")
+        current_app.extensions["category_ids"] = ids
+    return ids
+
+def assign(rows):
+    """Sets category_id on transaction row dicts that don't have one yet."""
+    ids = None
+    for row in rows:
+        if row.get("category_id") is None:
+            ids = ids or category_ids()
+            row["category_id"] = ids[categorize(row.get("description"), row["type"])]
+    return rows
+
+def backfill(chunk_size=1000):
+    """
+    Categorizes transactions recorded before categories existed, committing
+    every chunk_size rows.
+
+    Returns:
+        int: The number of transactions categorized.
+    """
+    ids = category_ids()
+    count = 0
+    while True:
+        rows = db.session.execute(
+            select(Transaction.id, Transaction.description, Transaction.type)
+            .where(Transaction.category_id.is_(None))
+            .order_by(Transaction.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return count
+
+        db.session.execute(update(Transaction), [
+            {"id": row.id, "category_id": ids[categorize(row.description, row.type)]} for row in rows
+        ])
+        db.session.commit()
+        count += len(rows)
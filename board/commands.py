@@ -0,0 +1,139 @@
+import os
+import click
+from flask.cli import AppGroup, with_appcontext
+
+from flask import current_app
+
+from board import ledger, ocr_utils, ocr_jobs, price_history, importer, exporter, categories
+from board.models import User
+
+ledger_cli = AppGroup("ledger", help="Maintain the per-user running totals and daily rollups.")
+
+@ledger_cli.command("rebuild")
+def rebuild_ledger():
+    """Recompute every user's totals and daily rollups from the transaction history."""
+    users, days = ledger.rebuild()
+    click.echo(f"Rebuilt ledger for {users} user(s) and {days} daily rollup(s).")
+
+@ledger_cli.command("verify")
+def verify_ledger():
+    """Check every user's totals and daily rollups against the transaction history."""
+    mismatches = ledger.verify()
+    for user_id, expected, actual in mismatches:
+        click.echo(f"User {user_id}: expected income/expense {expected}, ledger has {actual}")
+
+    rollup_mismatches = ledger.verify_rollups()
+    for user_id, day, expected, actual in rollup_mismatches:
+        click.echo(f"User {user_id} on {day}: expected income/expense/closing {expected}, rollup has {actual}")
+
+    if mismatches or rollup_mismatches:
+        raise click.ClickException(
+            f"{len(mismatches)} ledger(s) and {len(rollup_mismatches)} rollup(s) out of sync. "
+            "Run 'flask ledger rebuild'."
+        )
+    click.echo("All ledgers and rollups match the transaction history.")
+
+ocr_cli = AppGroup("ocr", help="Manage receipt OCR.")
+
+@ocr_cli.command("serve")
+def serve_ocr():
+    """Host one shared EasyOCR reader for all workers at OCR_SERVER_ADDRESS."""
+    if not os.getenv("OCR_SERVER_ADDRESS"):
+        raise click.ClickException("Set OCR_SERVER_ADDRESS (host:port) to run the OCR server.")
+    if not os.getenv("OCR_SERVER_AUTHKEY"):
+        raise click.ClickException("Set OCR_SERVER_AUTHKEY to a long random secret to run the OCR server.")
+
+    click.echo(f"Serving EasyOCR on {os.getenv('OCR_SERVER_ADDRESS')}")
+    ocr_utils.serve_ocr()
+
+@ocr_cli.command("cleanup-uploads")
+@click.option("--max-age-days", type=int, default=None,
+              help="Delete receipts archived longer ago than this (default: OCR_ARCHIVE_MAX_AGE_DAYS).")
+def cleanup_uploads(max_age_days):
+    """Delete archived receipts past their retention period."""
+    if max_age_days is None:
+        max_age_days = current_app.config["OCR_ARCHIVE_MAX_AGE_DAYS"]
+
+    deleted = ocr_jobs.purge_archive(current_app.config["UPLOAD_FOLDER"], max_age_days)
+    click.echo(f"Deleted {deleted} archived receipt(s) older than {max_age_days} day(s).")
+
+prices_cli = AppGroup("prices", help="Maintain the local stock price history.")
+
+@prices_cli.command("snapshot")
+@click.option("--period", default="5d", show_default=True,
+              help="How far back to fetch (a Yahoo Finance period such as 5d or 1mo).")
+def snapshot_prices(period):
+    """Append the latest daily closes of every held symbol. Run daily, e.g. from cron."""
+    symbols, days = price_history.snapshot_holdings(period)
+    click.echo(f"Stored {days} daily close(s) for {symbols} symbol(s).")
+
+categories_cli = AppGroup("categories", help="Maintain transaction categories.")
+
+@categories_cli.command("backfill")
+@click.option("--chunk-size", type=int, default=1000, show_default=True, help="Rows per update and commit.")
+def backfill_categories(chunk_size):
+    """Categorize transactions recorded before categories existed."""
+    count = categories.backfill(chunk_size)
+    click.echo(f"Categorized {count} transaction(s).")
+
+@click.command("import-transactions")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user", "username", required=True, help="Username to import the transactions for.")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ofx"]), default=None,
+              help="Statement format (default: from the file extension).")
+@click.option("--chunk-size", type=int, default=importer.CHUNK_SIZE, show_default=True,
+              help="Rows per bulk insert and commit.")
+@with_appcontext
+def import_transactions(path, username, fmt, chunk_size):
+    """Import a CSV or OFX bank statement into a user's transactions."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}.")
+
+    fmt = fmt or importer.detect_format(path)
+    if fmt is None:
+        raise click.ClickException("Can't tell the statement format from the file name; pass --format.")
+
+    try:
+        with open(path, "rb") as statement:
+            result = importer.import_statement(user.id, statement, fmt, chunk_size=chunk_size)
+    except importer.StatementError as e:
+        raise click.ClickException(str(e))
+
+    for error in result["errors"]:
+        click.echo(error)
+    click.echo(
+        f"Imported {result['imported']} transaction(s); skipped {result['duplicates']} duplicate(s) "
+        f"and {result['invalid']} invalid row(s)."
+    )
+
+@click.command("export-transactions")
+@click.option("--user", "username", required=True, help="Username to export the transactions of.")
+@click.option("--format", "fmt", type=click.Choice(list(exporter.FORMATS)), default="csv", show_default=True)
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), default=None, help="First day to include.")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Last day to include.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="File to write (default: stdout).")
+@with_appcontext
+def export_transactions(username, fmt, start, end, output):
+    """Stream a user's transactions to a CSV, NDJSON or Parquet file."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}.")
+
+    try:
+        chunks = exporter.export(user.id, fmt, start and start.date(), end and end.date())
+    except exporter.ExportUnavailable as e:
+        raise click.ClickException(str(e))
+
+    with click.open_file(output or "-", "wb") as out:
+        for chunk in chunks:
+            out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+
+def init_app(app):
+    app.cli.add_command(ledger_cli)
+    app.cli.add_command(ocr_cli)
+    app.cli.add_command(prices_cli)
+    app.cli.add_command(categories_cli)
+    app.cli.add_command(import_transactions)
+    app.cli.add_command(export_transactions)
@@ -0,0 +1,89 @@
+import os
+from sqlalchemy import event
+
+# Applied to every new SQLite connection. WAL lets readers carry on while one
+# writer commits, NORMAL only syncs at checkpoints (safe with WAL), and the
+# busy timeout makes writers queue for the lock instead of failing with
+# "database is locked".
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 15000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+DEFAULT_POOL_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+}
+
+def database_uri(app):
+    """
+    Returns the database URI from SQLALCHEMY_DATABASE_URI or DATABASE_URL in
+    the environment, falling back to app.db in the instance folder.
+    """
+    uri = os.getenv("SQLALCHEMY_DATABASE_URI") or os.getenv("DATABASE_URL")
+    if not uri:
+        return "sqlite:///" + os.path.join(app.instance_path, "app.db")
+    # Some hosts still hand out the old postgres:// scheme, which SQLAlchemy 2 rejects
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+def engine_options(uri, env=os.environ):
+    """
+    Returns SQLAlchemy engine options for a database URI. Server databases get
+    a connection pool sized from DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+    and DB_POOL_RECYCLE; SQLite keeps SQLAlchemy's default pool.
+    """
+    if uri.startswith("sqlite"):
+        return {}
+
+    options = dict(DEFAULT_POOL_OPTIONS)
+    for key, name in (("pool_size", "DB_POOL_SIZE"), ("max_overflow", "DB_MAX_OVERFLOW"),
+                      ("pool_timeout", "DB_POOL_TIMEOUT"), ("pool_recycle", "DB_POOL_RECYCLE")):
+        if env.get(name):
+            options[key] = int(env[name])
+    return options
+
+def init_app(app):
+    """
+    Sets the database URI, engine options and SQLite pragmas. Call before
+    db.init_app, then call apply_pragmas once the engine exists.
+    """
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri(app)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    app.config.setdefault("SQLITE_PRAGMAS", dict(DEFAULT_SQLITE_PRAGMAS))
+
+def apply_pragmas(app, db):
+    """Runs SQLITE_PRAGMAS on every connection the app's SQLite engine opens. Does nothing for other databases."""
+    with app.app_context():
+        engine = db.engine
+    pragmas = app.config["SQLITE_PRAGMAS"]
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def dialect_insert(table):
+    """
+    Returns an INSERT for a model or table in the app database's dialect, so
+    writes that race on a unique key can use on_conflict_do_update (SQLite
+    and PostgreSQL) instead of checking first and then inserting.
+    """
+    from board import db
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
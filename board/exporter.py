@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import importlib.util
+from datetime import datetime, timedelta
+from sqlalchemy import select
+
+from board.models import db, Transaction, Category
+
+BATCH_SIZE = 1000
+
+FIELDS = ("id", "created_at", "type", "amount", "description", "source", "category")
+
+# format: (mimetype, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+class ExportUnavailable(RuntimeError):
+    """Raised when an export format needs a library that isn't installed."""
+
+def check_format(fmt):
+    """
+    Raises:
+        ValueError: If fmt isn't one of FORMATS.
+        ExportUnavailable: If it's Parquet and pyarrow isn't installed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}. Use one of {', '.join(FORMATS)}.")
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ExportUnavailable("Parquet export needs pyarrow (pip install pyarrow).")
+
+def iter_batches(user_id, start=None, end=None, batch_size=BATCH_SIZE):
+    """
+    Reads a user's transactions oldest first, batch_size rows at a time,
+    through a streamed cursor (yield_per) so the full history is never held
+    in memory.
+
+    Args:
+        start (date): Only transactions on or after this day.
+        end (date): Only transactions on or before this day.
+
+    Yields:
+        list: Rows with the FIELDS columns.
+    """
+    columns = [getattr(Transaction, field) for field in FIELDS if field != "category"]
+    query = select(*columns, Category.name.label("category")) \
+        .outerjoin(Category, Transaction.category_id == Category.id) \
+        .where(Transaction.user_id == user_id) \
+        .order_by(Transaction.created_at, Transaction.id)
+    if start is not None:
+        query = query.where(Transaction.created_at >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        query = query.where(Transaction.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    try:
+        for batch in result.partitions():
+            yield batch
+    finally:
+        result.close()
+
+def to_csv(batches):
+    """Yields a CSV document (header first) one batch of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for batch in batches:
+        writer.writerows((row.id, row.created_at.isoformat(), *row[2:]) for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def to_ndjson(batches):
+    """Yields one JSON object per line, one batch of rows at a time."""
+    for batch in batches:
+        yield "".join(
+            json.dumps({**row._asdict(), "created_at": row.created_at.isoformat(), "amount": float(row.amount)}) + "\n"
+            for row in batch
+        )
+
+class _ChunkSink:
+    # Write-only file object that hands back whatever was written since the last drain
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def to_parquet(batches):
+    """
+    Yields a Parquet file with one row group per batch, sending each row
+    group as soon as it's written (the footer comes last).
+
+    Raises:
+        ExportUnavailable: If pyarrow isn't installed.
+    """
+    check_format("parquet")
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+        ("type", pa.string()),
+        ("amount", pa.decimal128(18, 2)),
+        ("description", pa.string()),
+        ("source", pa.string()),
+        ("category", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for batch in batches:
+            frame = pd.DataFrame.from_records(batch, columns=FIELDS)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export(user_id, fmt, start=None, end=None, batch_size=BATCH_SIZE):
+    """
+    Streams a user's transactions in the given format.
+
+    Returns:
+        generator: str chunks for csv/ndjson, bytes chunks for parquet.
+
+    Raises:
+        ValueError: If the format is unknown.
+        ExportUnavailable: If the format's library isn't installed.
+    """
+    check_format(fmt)
+    batches = iter_batches(user_id, start, end, batch_size)
+    if fmt == "csv":
+        return to_csv(batches)
+    if fmt == "ndjson":
+        return to_ndjson(batches)
+    return to_parquet(batches)
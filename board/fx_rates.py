@@ -0,0 +1,119 @@
+import os
+import json
+import tempfile
+import threading
+from datetime import datetime
+
+from board.market_data import YFinanceProvider
+
+class FxRateUnavailable(LookupError):
+    """Raised when no exchange rate has ever been fetched or persisted."""
+
+class FxRates:
+    """
+    Keeps the USD to PHP rate fresh on a background thread so request
+    handlers read it from memory instead of downloading it per request.
+
+    The last good rate is written to FX_STATE_PATH with its timestamp and
+    loaded again at start-up, so a restart (or an upstream outage) falls
+    back to the last known rate. The refresher thread starts on first use
+    and fetches every FX_REFRESH_INTERVAL seconds; only the very first call
+    on a fresh install waits (up to FX_STARTUP_TIMEOUT) for a rate.
+    """
+
+    def __init__(self, app=None, provider=None):
+        self.app = None
+        self.provider = None
+        self.rate = None
+        self.as_of = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, provider)
+
+    def init_app(self, app, provider=None):
+        app.config.setdefault("FX_PAIR", "USDPHP=X")
+        app.config.setdefault("FX_REFRESH_INTERVAL", 5 * 60)
+        app.config.setdefault("FX_STARTUP_TIMEOUT", 5)
+        app.config.setdefault("FX_STATE_PATH", os.path.join(app.instance_path, "fx_rate.json"))
+        app.extensions["fx_rates"] = self
+        self.app = app
+        self.provider = provider or YFinanceProvider()
+        self._load()
+
+    def get(self):
+        """
+        Returns the latest known rate without waiting on the upstream.
+
+        Returns:
+            tuple: (rate, as_of datetime in UTC)
+
+        Raises:
+            FxRateUnavailable: If no rate has been fetched yet.
+        """
+        self._start()
+        if self.rate is None:
+            self._ready.wait(self.app.config["FX_STARTUP_TIMEOUT"])
+        if self.rate is None:
+            raise FxRateUnavailable(f"No {self.app.config['FX_PAIR']} rate available yet.")
+        return self.rate, self.as_of
+
+    def refresh(self):
+        """Fetches the rate once and persists it. Returns True if a rate was stored."""
+        try:
+            rate = self.provider.fx_rate(self.app.config["FX_PAIR"])
+        except Exception as e:
+            self.app.logger.warning(f"FX refresh failed, keeping rate from {self.as_of}: {e}")
+            return False
+        if not rate:
+            self.app.logger.warning(f"FX refresh returned no rate, keeping rate from {self.as_of}")
+            return False
+
+        self.rate, self.as_of = float(rate), datetime.utcnow()
+        self._ready.set()
+        self._save()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _start(self):
+        # One refresher thread per process, started on first use so CLI commands don't run it
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="fx-refresh", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.app.config["FX_REFRESH_INTERVAL"])
+
+    def _load(self):
+        path = self.app.config["FX_STATE_PATH"]
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            self.rate, self.as_of = float(state["rate"]), datetime.fromisoformat(state["as_of"])
+            self._ready.set()
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            self.app.logger.warning(f"Ignoring unreadable FX state in {path}: {e}")
+
+    def _save(self):
+        # Written to a temporary file first so other workers never read a partial file
+        path = self.app.config["FX_STATE_PATH"]
+        state = {"pair": self.app.config["FX_PAIR"], "rate": self.rate, "as_of": self.as_of.isoformat()}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.app.logger.warning(f"Could not persist FX rate to {path}: {e}")
+
+fx_rates = FxRates()
@@ -0,0 +1,107 @@
+import numpy as np
+from sqlalchemy import bindparam, update
+
+from board.models import db, Goal
+from board import ledger, money
+from board.reports import GOAL_DISTRIBUTION_PREFIX
+
+def allocate(balance_cents, priorities, capacities):
+    """
+    Splits a balance across goals in proportion to their priorities without
+    overfilling any goal. Whatever a capped goal can't take is shared again
+    among the rest ("water-filling"), so the loop runs at most once per goal.
+
+    Args:
+        balance_cents (int): The amount to distribute, in centavos.
+        priorities (array-like): Each goal's weight; goals with 0 get nothing.
+        capacities (array-like): How many centavos each goal can still take.
+
+    Returns:
+        numpy.ndarray: Centavos per goal (int64). The result sums exactly to
+        min(balance, total capacity); leftover fractions of a centavo go to
+        the goals with the largest remainders.
+    """
+    priorities = np.asarray(priorities, dtype=np.float64)
+    capacities = np.maximum(np.asarray(capacities, dtype=np.int64), 0)
+    allocation = np.zeros(len(priorities), dtype=np.float64)
+
+    active = (priorities > 0) & (capacities > 0)
+    left = float(balance_cents)
+    while left > 0 and active.any():
+        weights = np.where(active, priorities, 0.0)
+        share = left * weights / weights.sum()
+        capped = active & (allocation + share >= capacities)
+        if not capped.any():
+            allocation += share
+            break
+        left -= float((capacities[capped] - allocation[capped]).sum())
+        allocation[capped] = capacities[capped]
+        active &= ~capped
+
+    # Largest-remainder rounding to whole centavos
+    cents = np.floor(allocation).astype(np.int64)
+    target = min(int(balance_cents), int(capacities[priorities > 0].sum()))
+    shortfall = target - int(cents.sum())
+    if shortfall > 0:
+        remainders = np.where((priorities > 0) & (cents < capacities), allocation - cents, -1.0)
+        cents[np.argsort(-remainders, kind="stable")[:shortfall]] += 1
+    return cents
+
+def plan_distribution(user_id):
+    """
+    Works out how the user's current balance would be split across their goals.
+
+    Returns:
+        tuple: (balance, [{"goal_id", "name", "amount", "current_amount",
+        "new_amount", "target_amount"}] for every goal that receives money)
+    """
+    income, expense = ledger.get_totals(user_id)
+    balance = income - expense
+    goals = Goal.query.filter_by(user_id=user_id).order_by(Goal.id).all()
+    if balance <= 0 or not goals:
+        return balance, []
+
+    cents = allocate(
+        money.to_centavos(balance),
+        [goal.priority for goal in goals],
+        [money.to_centavos(max(goal.target_amount - goal.current_amount, 0)) for goal in goals]
+    )
+    return balance, [
+        {
+            "goal_id": goal.id,
+            "name": goal.name,
+            "amount": money.from_centavos(amount),
+            "current_amount": goal.current_amount,
+            "new_amount": goal.current_amount + money.from_centavos(amount),
+            "target_amount": goal.target_amount
+        }
+        for goal, amount in zip(goals, cents) if amount > 0
+    ]
+
+def apply_distribution(user_id, distributions):
+    """
+    Adds each planned amount to its goal with one executemany UPDATE and
+    records the matching expenses with one bulk INSERT. Nothing is committed here.
+
+    Returns:
+        Decimal: The total distributed.
+    """
+    if not distributions:
+        return 0
+
+    db.session.execute(
+        update(Goal.__table__)
+        .where(Goal.__table__.c.id == bindparam("goal_id"), Goal.__table__.c.user_id == user_id)
+        .values(current_amount=Goal.__table__.c.current_amount + bindparam("amount")),
+        [{"goal_id": d["goal_id"], "amount": d["amount"]} for d in distributions]
+    )
+    ledger.add_transactions(user_id, [
+        {
+            "type": "expense",
+            "amount": d["amount"],
+            "description": f"{GOAL_DISTRIBUTION_PREFIX} {d['name']}",
+            "source": "Goal Distribution"
+        }
+        for d in distributions
+    ])
+    return sum(d["amount"] for d in distributions)
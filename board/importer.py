@@ -0,0 +1,320 @@
+import csv
+import io
+import re
+import html
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import func
+
+from board.models import db, Transaction
+from board import ledger, money
+
+CHUNK_SIZE = 1000
+
+# Row problems reported back to the user; the rest are only counted
+MAX_ERRORS = 20
+
+DESCRIPTION_LENGTH = 200
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d", "%d-%b-%Y", "%b %d, %Y", "%d %b %Y", "%Y%m%d")
+
+# Header names banks commonly use for each field, compared lowercased
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "value date", "trans date"),
+    "description": ("description", "memo", "payee", "name", "details", "narrative", "particulars"),
+    "amount": ("amount", "transaction amount", "amount (php)"),
+    "debit": ("debit", "debit amount", "withdrawal", "withdrawals", "money out"),
+    "credit": ("credit", "credit amount", "deposit", "deposits", "money in"),
+    "type": ("type", "transaction type"),
+}
+
+INCOME_TYPES = {"income", "credit", "deposit", "cr", "dep"}
+EXPENSE_TYPES = {"expense", "debit", "withdrawal", "dr", "payment", "pos", "atm", "fee", "check"}
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+# Besides the number, an amount may only carry a currency marker, spaces and thousands separators
+_CURRENCY_MARKERS = re.compile(r"₱|PHP|\$|USD|\s", re.IGNORECASE)
+_AMOUNT = re.compile(r"[+-]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.\d+)?")
+
+class StatementError(ValueError):
+    """Raised when a statement file can't be read at all, e.g. a CSV without a date or amount column."""
+
+def detect_format(filename):
+    """Returns "csv" or "ofx" from a statement's file name, or None if it's neither."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension == "csv":
+        return "csv"
+    if extension in ("ofx", "qfx"):
+        return "ofx"
+    return None
+
+def parse_amount(text):
+    """
+    Parses a statement amount such as "1,234.50", "₱-12.00" or "(12.00)" into a Decimal.
+
+    Raises:
+        ValueError: If the text is anything else, e.g. "1e3" or "12.00 CR",
+            so the row is counted as invalid rather than imported wrong.
+    """
+    text = text.strip()
+    negative = text.startswith("(") and text.endswith(")")
+    cleaned = _CURRENCY_MARKERS.sub("", text[1:-1] if negative else text)
+    if not cleaned.strip("+-.") or not _AMOUNT.fullmatch(cleaned):
+        raise ValueError(f"Invalid amount '{text}'")
+    try:
+        amount = money.to_decimal(cleaned.replace(",", ""))
+    except ValueError:
+        raise ValueError(f"Invalid amount '{text}'")
+    return -abs(amount) if negative else amount
+
+# Statements repeat the same few hundred dates, so most rows skip strptime entirely
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """
+    Parses a statement date in any of DATE_FORMATS.
+
+    Raises:
+        ValueError: If the date matches none of them.
+    """
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date '{text}'")
+
+def _row(kind, amount, description, created_at, source):
+    if amount == 0:
+        raise ValueError("Amount is zero")
+    description = " ".join(description.split())[:DESCRIPTION_LENGTH] or "Imported transaction"
+    return {
+        "type": kind or ("income" if amount > 0 else "expense"),
+        "amount": abs(amount),
+        "description": description,
+        "source": source,
+        "created_at": created_at
+    }
+
+def _csv_columns(fieldnames):
+    headers = {name.strip().lower(): name for name in fieldnames or [] if name}
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[field] = headers[alias]
+                break
+    if "date" not in columns or not ("amount" in columns or "debit" in columns or "credit" in columns):
+        raise StatementError("The CSV needs a date column and an amount (or debit/credit) column.")
+    return columns
+
+def parse_csv(stream, source="CSV Import"):
+    """
+    Reads a CSV statement one row at a time.
+
+    Yields:
+        tuple: (line number, transaction dict or None, error message or None)
+
+    Raises:
+        StatementError: If the header has no recognizable date or amount column.
+    """
+    reader = csv.DictReader(stream)
+    columns = _csv_columns(reader.fieldnames)
+
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, None, str(e)
+            continue
+
+        def value(field):
+            return (record.get(columns[field]) or "").strip() if field in columns else ""
+
+        try:
+            created_at = parse_date(value("date"))
+            if value("amount"):
+                amount = parse_amount(value("amount"))
+            elif value("credit"):
+                amount = abs(parse_amount(value("credit")))
+            else:
+                amount = -abs(parse_amount(value("debit")))
+
+            label = value("type").lower()
+            kind = "income" if label in INCOME_TYPES else "expense" if label in EXPENSE_TYPES else None
+
+            description = value("description")
+            yield reader.line_num, _row(kind, amount, description, created_at, source), None
+        except ValueError as e:
+            yield reader.line_num, None, str(e)
+
+def _ofx_elements(stream, read_size=64 * 1024):
+    # Tag/value pairs from an OFX file (SGML or XML), read in blocks so long files stay out of memory
+    buffer = ""
+    while True:
+        block = stream.read(read_size)
+        buffer += block
+        # Hold back the last, possibly cut-off tag until the next block arrives
+        cut = buffer.rfind("<") if block else len(buffer)
+        if cut > 0:
+            for match in _OFX_TAG.finditer(buffer, 0, cut):
+                yield match.group(1) == "/", match.group(2).upper(), html.unescape(match.group(3).strip())
+            buffer = buffer[cut:]
+        if not block:
+            return
+
+def parse_ofx(stream, source="OFX Import"):
+    """
+    Reads the STMTTRN records of an OFX/QFX statement one at a time.
+
+    Yields:
+        tuple: (record number, transaction dict or None, error message or None)
+    """
+    number = 0
+    record = None
+    for closing, tag, value in _ofx_elements(stream):
+        if tag == "STMTTRN":
+            if closing and record is not None:
+                number += 1
+                try:
+                    yield number, _ofx_row(record, source), None
+                except ValueError as e:
+                    yield number, None, str(e)
+                record = None
+            elif not closing:
+                record = {}
+        elif record is not None and not closing and value:
+            record[tag] = value
+
+def _ofx_row(record, source):
+    if "DTPOSTED" not in record or "TRNAMT" not in record:
+        raise ValueError("Missing DTPOSTED or TRNAMT")
+    created_at = datetime.strptime(record["DTPOSTED"][:8], "%Y%m%d")
+    amount = parse_amount(record["TRNAMT"])
+
+    label = record.get("TRNTYPE", "").lower()
+    kind = "income" if label in INCOME_TYPES else "expense" if label in EXPENSE_TYPES else None
+
+    name, memo = record.get("NAME", ""), record.get("MEMO", "")
+    description = name if not memo or memo == name else f"{name} {memo}" if name else memo
+    return _row(kind, amount, description, created_at, source)
+
+def _key(created_at, amount, kind, description):
+    return created_at.date(), money.to_centavos(amount), kind, description
+
+class _ExistingKeys:
+    """
+    Dedupe keys of the transactions a user had before an import started,
+    loaded a date range at a time and kept per day as hashes (a fraction of
+    the memory of the tuples), evicting the least recently used days once
+    more than `max_keys` keys are held. Each day is
+    read from the database about once however the rows are chunked, unless
+    the statement is out of order and spans more history than fits.
+    """
+
+    def __init__(self, user_id, before_id, max_keys=200_000):
+        self.user_id = user_id
+        self.before_id = before_id
+        self.max_keys = max_keys
+        self._days = OrderedDict()
+        self._size = 0
+
+    def contains(self, row):
+        return hash(_key(row["created_at"], row["amount"], row["type"], row["description"])) in self._days[row["created_at"].date()]
+
+    def load(self, rows):
+        """Makes sure the keys for every day in rows are loaded."""
+        days = {row["created_at"].date() for row in rows}
+        missing = days - set(self._days)
+        if missing:
+            start, end = min(missing), max(missing) + timedelta(days=1)
+            loaded = {day: set() for day in missing}
+            existing = db.session.query(Transaction.created_at, Transaction.amount, Transaction.type, Transaction.description) \
+                .filter(
+                    Transaction.user_id == self.user_id,
+                    Transaction.created_at >= datetime.combine(start, datetime.min.time()),
+                    Transaction.created_at < datetime.combine(end, datetime.min.time()),
+                    Transaction.id <= self.before_id
+                ) \
+                .yield_per(CHUNK_SIZE)
+            for row in existing:
+                loaded.setdefault(row.created_at.date(), set()).add(hash(_key(*row)))
+            # Other days in the range came along for free; keep them too (already cached ones are unchanged)
+            for day, keys in loaded.items():
+                if day not in self._days:
+                    self._days[day] = keys
+                    self._size += len(keys)
+
+        # This chunk's days go last so eviction never drops them
+        for day in days:
+            self._days.move_to_end(day)
+        while self._size > self.max_keys and len(self._days) > len(days):
+            _, keys = self._days.popitem(last=False)
+            self._size -= len(keys)
+
+def import_statement(user_id, binary_stream, fmt, chunk_size=CHUNK_SIZE):
+    """
+    Streams a CSV or OFX statement into a user's transactions.
+
+    Rows are parsed one at a time and written in chunks: each chunk is checked
+    against the user's existing transactions, inserted with one executemany
+    through ledger.add_transactions and committed, so memory depends on the
+    chunk size (plus a bounded cache of existing keys), not on the length of
+    the statement. A row counts as a duplicate when a
+    transaction with the same date, amount, type and description existed
+    before the import began; repeats within the file itself are all kept,
+    since statements legitimately list the same charge twice. Chunks
+    committed before a failure stay imported.
+
+    Args:
+        user_id (int): Owner of the imported transactions.
+        binary_stream: A file object opened in binary mode.
+        fmt (str): "csv" or "ofx".
+        chunk_size (int): Rows per insert and commit.
+
+    Returns:
+        dict: {"imported": int, "duplicates": int, "invalid": int,
+        "errors": ["line N: message", ...] (the first MAX_ERRORS)}
+
+    Raises:
+        StatementError: If the file can't be read as a statement of that format.
+    """
+    if fmt not in ("csv", "ofx"):
+        raise StatementError(f"Unsupported statement format: {fmt}")
+
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", errors="replace", newline="")
+    result = {"imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    before_id = db.session.query(func.max(Transaction.id)).filter(Transaction.user_id == user_id).scalar() or 0
+    existing = _ExistingKeys(user_id, before_id)
+
+    def flush(rows):
+        existing.load(rows)
+        fresh = [row for row in rows if not existing.contains(row)]
+        result["duplicates"] += len(rows) - len(fresh)
+        result["imported"] += ledger.add_transactions(user_id, fresh)
+        db.session.commit()
+
+    try:
+        records = parse_csv(text) if fmt == "csv" else parse_ofx(text)
+        chunk = []
+        for line, row, error in records:
+            if error:
+                result["invalid"] += 1
+                if len(result["errors"]) < MAX_ERRORS:
+                    result["errors"].append(f"{'line' if fmt == 'csv' else 'record'} {line}: {error}")
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+    return result
@@ -0,0 +1,257 @@
+from datetime import datetime
+from sqlalchemy import bindparam, func, insert, update
+
+from board.models import db, Transaction, Ledger, DailyRollup
+from board import money, categories
+from board.db_config import dialect_insert
+
+def add_transactions(user_id, rows):
+    """
+    Inserts transactions for a user and applies them to the user's ledger and
+    daily rollups. Nothing is committed here, so the insert and the totals
+    update land in the caller's database transaction together.
+
+    Args:
+        user_id (int): Owner of the transactions.
+        rows (list): Dicts with type, amount, description and source keys, and
+            optionally created_at (defaults to now) and category_id (defaults
+            to the category matched from the description).
+
+    Returns:
+        int: The number of transactions inserted.
+    """
+    if not rows:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [
+        dict(row, amount=money.to_decimal(row["amount"]), user_id=user_id, created_at=row.get("created_at") or now)
+        for row in rows
+    ]
+    categories.assign(rows)
+    db.session.execute(insert(Transaction), rows)
+
+    # The ledger upsert goes first: it locks the user's ledger row until commit,
+    # so concurrent writes for one user apply their rollup deltas one at a time
+    income = sum(row["amount"] for row in rows if row["type"] == "income")
+    expense = sum(row["amount"] for row in rows if row["type"] != "income")
+    apply_delta(user_id, income, expense)
+
+    by_day = {}
+    for row in rows:
+        totals = by_day.setdefault(row["created_at"].date(), [0, 0])
+        totals[0 if row["type"] == "income" else 1] += row["amount"]
+    if len(by_day) == 1:
+        (day, totals), = by_day.items()
+        apply_daily_delta(user_id, day, *totals)
+    else:
+        apply_daily_deltas(user_id, by_day)
+
+    return len(rows)
+
+def apply_delta(user_id, income=0, expense=0):
+    """
+    Adds income/expense deltas to a user's ledger row, creating it if needed.
+    One upsert, so concurrent first writes for a user can't both insert it.
+    """
+    statement = dialect_insert(Ledger).values(
+        user_id=user_id, income=income, expense=expense, updated_at=datetime.utcnow()
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "income": Ledger.income + statement.excluded.income,
+            "expense": Ledger.expense + statement.excluded.expense,
+            "updated_at": statement.excluded.updated_at,
+        }
+    ))
+
+def apply_daily_delta(user_id, day, income=0, expense=0):
+    """
+    Adds one day's income/expense to the user's rollup for that day and carries
+    the net change into the closing balance of every later day.
+    """
+    net = income - expense
+    # A new day opens at the previous day's close; an existing one (possibly
+    # inserted by a concurrent write) just gains the deltas
+    previous = db.session.query(DailyRollup.closing_balance) \
+        .filter(DailyRollup.user_id == user_id, DailyRollup.day < day) \
+        .order_by(DailyRollup.day.desc()).limit(1).scalar() or 0
+    statement = dialect_insert(DailyRollup).values(
+        user_id=user_id, day=day, income=income, expense=expense, closing_balance=previous + net
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={
+            "income": DailyRollup.income + statement.excluded.income,
+            "expense": DailyRollup.expense + statement.excluded.expense,
+            "closing_balance": DailyRollup.closing_balance + net,
+        }
+    ))
+
+    # Back-dated writes shift every later closing balance; for today's writes this touches nothing
+    if net:
+        db.session.execute(
+            update(DailyRollup)
+            .where(DailyRollup.user_id == user_id, DailyRollup.day > day)
+            .values(closing_balance=DailyRollup.closing_balance + net)
+        )
+
+def apply_daily_deltas(user_id, by_day):
+    """
+    Applies several days' income/expense to the user's rollups with one
+    executemany UPDATE and one bulk upsert, instead of a round of statements
+    per day. Meant for imports and other writes spanning many days.
+
+    Args:
+        by_day (dict): {date: [income, expense]}
+    """
+    first = min(by_day)
+    existing = db.session.query(DailyRollup.id, DailyRollup.day, DailyRollup.closing_balance) \
+        .filter(DailyRollup.user_id == user_id, DailyRollup.day >= first) \
+        .order_by(DailyRollup.day).all()
+    closing = db.session.query(DailyRollup.closing_balance) \
+        .filter(DailyRollup.user_id == user_id, DailyRollup.day < first) \
+        .order_by(DailyRollup.day.desc()).limit(1).scalar() or 0
+
+    # Walk every affected day in order, carrying the net change into later closing balances
+    rollups = {row.day: row for row in existing}
+    carried = 0
+    updates, inserts = [], []
+    for day in sorted(set(rollups) | set(by_day)):
+        income, expense = by_day.get(day, (0, 0))
+        carried += income - expense
+        if day in rollups:
+            closing = rollups[day].closing_balance + carried
+            if income or expense or carried:
+                updates.append({"rollup_id": rollups[day].id, "d_income": income, "d_expense": expense, "d_closing": carried})
+        else:
+            closing += income - expense
+            inserts.append({
+                "user_id": user_id, "day": day, "income": income, "expense": expense,
+                "closing_balance": closing, "d_closing": carried
+            })
+
+    if updates:
+        table = DailyRollup.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("rollup_id"))
+            .values(
+                income=table.c.income + bindparam("d_income"),
+                expense=table.c.expense + bindparam("d_expense"),
+                closing_balance=table.c.closing_balance + bindparam("d_closing")
+            ),
+            updates
+        )
+    if inserts:
+        # A day a concurrent write inserted since the read above gains the deltas instead
+        table = DailyRollup.__table__
+        statement = dialect_insert(table)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "day"],
+                set_={
+                    "income": table.c.income + statement.excluded.income,
+                    "expense": table.c.expense + statement.excluded.expense,
+                    "closing_balance": table.c.closing_balance + bindparam("d_closing"),
+                }
+            ),
+            inserts
+        )
+
+def get_totals(user_id):
+    """Returns a user's (income, expense) totals from the ledger."""
+    ledger = db.session.get(Ledger, user_id)
+    if ledger is None:
+        return 0, 0
+    return ledger.income, ledger.expense
+
+def _scan_totals():
+    # Full-history totals per user, computed the slow way from the transaction table
+    income = func.sum(db.case((Transaction.type == "income", Transaction.amount), else_=0))
+    # Amount goes first so the sum is typed as Money and read back as a Decimal
+    expense = func.sum(db.case((Transaction.type != "income", Transaction.amount), else_=0))
+    rows = db.session.query(Transaction.user_id, income, expense).group_by(Transaction.user_id).all()
+    return {user_id: (inc or 0, exp or 0) for user_id, inc, exp in rows}
+
+def _scan_daily_totals():
+    # Per-user, per-day totals with running closing balances, oldest day first
+    day = func.date(Transaction.created_at).label("day")
+    income = func.sum(db.case((Transaction.type == "income", Transaction.amount), else_=0))
+    expense = func.sum(db.case((Transaction.type != "income", Transaction.amount), else_=0))
+    rows = db.session.query(Transaction.user_id, day, income, expense) \
+        .group_by(Transaction.user_id, day).order_by(Transaction.user_id, day).all()
+
+    balances = {}
+    for user_id, day_value, inc, exp in rows:
+        day_value = day_value if not isinstance(day_value, str) else datetime.strptime(day_value, "%Y-%m-%d").date()
+        balances[user_id] = balances.get(user_id, 0) + (inc or 0) - (exp or 0)
+        yield user_id, day_value, inc or 0, exp or 0, balances[user_id]
+
+def rebuild():
+    """
+    Recomputes every user's ledger and daily rollups from the transaction history.
+
+    Returns:
+        tuple: (ledger rows written, rollup rows written)
+    """
+    totals = _scan_totals()
+    db.session.query(Ledger).delete()
+    db.session.add_all(
+        Ledger(user_id=user_id, income=income, expense=expense)
+        for user_id, (income, expense) in totals.items()
+    )
+
+    db.session.query(DailyRollup).delete()
+    rollups = [
+        {"user_id": user_id, "day": day, "income": income, "expense": expense, "closing_balance": closing}
+        for user_id, day, income, expense, closing in _scan_daily_totals()
+    ]
+    if rollups:
+        db.session.execute(insert(DailyRollup), rollups)
+
+    db.session.commit()
+    return len(totals), len(rollups)
+
+def verify():
+    """
+    Compares each user's ledger against the transaction history. Amounts are
+    whole centavos, so any difference at all is a mismatch.
+
+    Returns:
+        list: (user_id, expected (income, expense), ledger (income, expense))
+        for every user whose totals disagree.
+    """
+    expected = _scan_totals()
+    actual = {ledger.user_id: (ledger.income, ledger.expense) for ledger in Ledger.query.all()}
+
+    mismatches = []
+    for user_id in sorted(set(expected) | set(actual)):
+        want = tuple(expected.get(user_id, (0, 0)))
+        have = tuple(actual.get(user_id, (0, 0)))
+        if want != have:
+            mismatches.append((user_id, want, have))
+    return mismatches
+
+def verify_rollups():
+    """
+    Compares every daily rollup against the transaction history.
+
+    Returns:
+        list: (user_id, day, expected (income, expense, closing), rollup (income, expense, closing))
+        for every day whose figures disagree.
+    """
+    expected = {(user_id, day): values for user_id, day, *values in _scan_daily_totals()}
+    actual = {
+        (r.user_id, r.day): (r.income, r.expense, r.closing_balance)
+        for r in DailyRollup.query.all()
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        want = tuple(expected.get(key, (0, 0, 0)))
+        have = tuple(actual.get(key, (0, 0, 0)))
+        if want != have:
+            mismatches.append((*key, want, have))
+    return mismatches
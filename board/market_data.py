@@ -0,0 +1,306 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+class YFinanceProvider:
+    """Fetches market data from Yahoo Finance. Every method makes upstream calls."""
+
+    def quote(self, symbol):
+        """
+        Returns:
+            dict: name, sector, market_cap, price and previous_close (USD).
+
+        Raises:
+            LookupError: If Yahoo has no prices for the symbol.
+        """
+        import yfinance as yf
+        ticker = yf.Ticker(symbol)
+        info = ticker.info
+        hist = ticker.history(period="1d")
+        if hist.empty:
+            raise LookupError(f"No data found for {symbol}")
+
+        price = float(hist["Close"].iloc[-1])
+        return {
+            "name": info.get("longName", symbol),
+            "sector": info.get("sector", "N/A"),
+            "market_cap": info.get("marketCap", 0),
+            "price": price,
+            "previous_close": float(hist["Close"].iloc[-2]) if len(hist) > 1 else price
+        }
+
+    def profile(self, symbol):
+        """
+        Returns:
+            dict: name, sector and market_cap. Changes rarely, so it is cached much longer than prices.
+        """
+        import yfinance as yf
+        info = yf.Ticker(symbol).info
+        return {
+            "name": info.get("longName", symbol),
+            "sector": info.get("sector", "N/A"),
+            "market_cap": info.get("marketCap", 0)
+        }
+
+    def prices(self, symbols):
+        """
+        Fetches the latest and previous close for several symbols with one
+        multi-ticker download.
+
+        Returns:
+            dict: {symbol: {"price": float, "previous_close": float}} (USD); symbols
+            Yahoo has no prices for are left out.
+        """
+        prices = {}
+        for symbol, series in self.daily_closes(symbols, "5d").items():
+            closes = series["closes"]
+            prices[symbol] = {
+                "price": closes[-1],
+                "previous_close": closes[-2] if len(closes) > 1 else closes[-1]
+            }
+        return prices
+
+    def daily_closes(self, symbols, period):
+        """
+        Fetches daily closing prices for several symbols with one multi-ticker download.
+
+        Returns:
+            dict: {symbol: {"dates": ["YYYY-MM-DD", ...], "closes": [float, ...]}} (USD);
+            symbols Yahoo has no prices for are left out.
+        """
+        import yfinance as yf
+        import pandas as pd
+        data = yf.download(
+            list(symbols), period=period, group_by="ticker", auto_adjust=False, progress=False, threads=True
+        )
+        if data.empty:
+            return {}
+
+        series = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                closes = data[symbol]["Close"].dropna()
+            else:
+                closes = data["Close"].dropna()
+            if closes.empty:
+                continue
+            series[symbol] = {"dates": closes.index.strftime("%Y-%m-%d").tolist(), "closes": closes.astype(float).tolist()}
+        return series
+
+    def history(self, symbol, period):
+        """
+        Returns:
+            dict: {"dates": ["YYYY-MM-DD", ...], "closes": [float, ...]}
+
+        Raises:
+            LookupError: If Yahoo has no history for the symbol.
+        """
+        import yfinance as yf
+        hist = yf.Ticker(symbol).history(period=period)
+        if hist.empty:
+            raise LookupError(f"No history found for {symbol}")
+        return {"dates": hist.index.strftime("%Y-%m-%d").tolist(), "closes": hist["Close"].tolist()}
+
+    def fx_rate(self, pair):
+        """Returns the latest rate for a Yahoo currency pair such as USDPHP=X, or None."""
+        import yfinance as yf
+        data = yf.Ticker(pair).history(period="1d")
+        if data.empty:
+            return None
+        return float(data["Close"].iloc[-1])
+
+class _Entry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+class TTLCache:
+    """
+    An in-process cache for slow upstream calls.
+
+    - Values are fresh for `ttl` seconds and then served stale for up to
+      `stale_ttl` more seconds while one background fetch refreshes them.
+      A request that finds a stale value waits at most `refresh_timeout`
+      seconds for the refresh before falling back to the stale value.
+    - Concurrent misses for the same key share a single upstream fetch
+      (single-flight), so a burst of polls costs one call per key.
+    - Failed fetches are not cached; a stale value is served instead if there
+      is one. At most `max_entries` keys are kept (least recently used first out).
+    """
+
+    def __init__(self, executor, max_entries=1024, clock=time.monotonic):
+        self._executor = executor
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, ttl, stale_ttl=0, refresh_timeout=0, fetch_timeout=None):
+        """
+        Returns the cached value for key, calling fetch() to fill or refresh it.
+
+        Raises:
+            Exception: Whatever fetch() raised, or TimeoutError after fetch_timeout
+            seconds, when there is no stale value to fall back to.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = self._clock() - entry.fetched_at
+                if age < ttl:
+                    return entry.value
+                if age >= ttl + stale_ttl:
+                    entry = None
+            flight = self._flights.get(key)
+            started = flight is None
+            if started:
+                flight = self._executor.submit(fetch)
+                self._flights[key] = flight
+
+        if started:
+            # Registered outside the lock: a fetch that already finished runs the callback right here
+            flight.add_done_callback(lambda f, key=key: self._land(key, f))
+
+        if entry is None:
+            try:
+                return flight.result(timeout=fetch_timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"Timed out fetching {key}")
+
+        try:
+            return flight.result(timeout=refresh_timeout)
+        except Exception:
+            # Slow or failing upstream; the refresh keeps running and lands later
+            return entry.value
+
+    def _land(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+            if flight.exception() is None:
+                self._entries[key] = _Entry(flight.result(), self._clock())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class MarketData:
+    """
+    Cached access to quotes and price history for the investment tracker
+    (FX rates are kept fresh separately, see board.fx_rates). Requests from
+    every user share the cache, so identical upstream calls within the TTL
+    are made once.
+
+    The upstream is any object with quote, profile, prices, daily_closes and
+    history methods (see YFinanceProvider); pass another provider to init_app
+    to run against a local stub. MARKET_DATA_TTL sets how long each kind of
+    data stays fresh, MARKET_DATA_STALE_TTL how long it may be served stale
+    while refreshing, MARKET_DATA_REFRESH_TIMEOUT how long a request waits
+    for a refresh before taking the stale value, and MARKET_DATA_FETCH_TIMEOUT
+    how long a request waits on a cold fetch.
+    """
+
+    def __init__(self, app=None, provider=None):
+        self.app = None
+        self.provider = None
+        self.cache = None
+        self._fanout = None
+        if app is not None:
+            self.init_app(app, provider)
+
+    def init_app(self, app, provider=None):
+        app.config.setdefault("MARKET_DATA_TTL", {"quote": 60, "prices": 60, "profile": 24 * 60 * 60, "history": 15 * 60})
+        app.config.setdefault("MARKET_DATA_STALE_TTL", 60 * 60)
+        app.config.setdefault("MARKET_DATA_REFRESH_TIMEOUT", 2)
+        app.config.setdefault("MARKET_DATA_FETCH_TIMEOUT", 15)
+        app.config.setdefault("MARKET_DATA_WORKERS", 4)
+        app.config.setdefault("MARKET_DATA_MAX_ENTRIES", 1024)
+        app.extensions["market_data"] = self
+        self.app = app
+
+        self.provider = provider or YFinanceProvider()
+        self.cache = TTLCache(
+            ThreadPoolExecutor(max_workers=app.config["MARKET_DATA_WORKERS"], thread_name_prefix="market-data"),
+            max_entries=app.config["MARKET_DATA_MAX_ENTRIES"]
+        )
+        # Waits on several cache lookups at once; the fetches themselves run on the cache's pool
+        self._fanout = ThreadPoolExecutor(max_workers=app.config["MARKET_DATA_WORKERS"], thread_name_prefix="market-fanout")
+
+    def _get(self, kind, key, fetch):
+        config = self.app.config
+        return self.cache.get(
+            (kind, *key), fetch,
+            ttl=config["MARKET_DATA_TTL"][kind],
+            stale_ttl=config["MARKET_DATA_STALE_TTL"],
+            refresh_timeout=config["MARKET_DATA_REFRESH_TIMEOUT"],
+            fetch_timeout=config["MARKET_DATA_FETCH_TIMEOUT"]
+        )
+
+    def quote(self, symbol):
+        """Returns the provider's quote dict for a symbol (see YFinanceProvider.quote)."""
+        symbol = symbol.upper()
+        return self._get("quote", (symbol,), lambda: self.provider.quote(symbol))
+
+    def profile(self, symbol):
+        """Returns the provider's name/sector/market cap for a symbol."""
+        symbol = symbol.upper()
+        return self._get("profile", (symbol,), lambda: self.provider.profile(symbol))
+
+    def portfolio_quotes(self, symbols):
+        """
+        Returns quotes for several symbols at once. Prices come from one
+        batched download (cached per set of symbols); profiles are looked up
+        concurrently, and symbols missing from the batch fall back to
+        concurrent single-symbol quotes.
+
+        Returns:
+            dict: {symbol: quote dict (see YFinanceProvider.quote)}, leaving out
+            symbols no price could be found for.
+        """
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        if not symbols:
+            return {}
+
+        try:
+            prices = self._get("prices", tuple(symbols), lambda: self.provider.prices(symbols))
+        except Exception as e:
+            self.app.logger.warning(f"Batched price download failed, fetching one by one: {e}")
+            prices = {}
+
+        quotes = {}
+        batched = [symbol for symbol in symbols if symbol in prices]
+        for symbol, profile in zip(batched, self._fanout.map(self._try(self.profile), batched)):
+            quotes[symbol] = {**(profile or {"name": symbol, "sector": "N/A", "market_cap": 0}), **prices[symbol]}
+
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        for symbol, quote in zip(missing, self._fanout.map(self._try(self.quote), missing)):
+            if quote is not None:
+                quotes[symbol] = quote
+
+        return quotes
+
+    def _try(self, lookup):
+        # Wraps a per-symbol lookup so one failing symbol doesn't fail the whole portfolio
+        def call(symbol):
+            try:
+                return lookup(symbol)
+            except Exception as e:
+                self.app.logger.warning(f"Market data lookup failed for {symbol}: {e}")
+                return None
+        return call
+
+    def history(self, symbol, period="1mo"):
+        """Returns the provider's closing-price history for a symbol and period."""
+        symbol = symbol.upper()
+        return self._get("history", (symbol, period), lambda: self.provider.history(symbol, period))
+
+market_data = MarketData()
@@ -1,3 +1,4 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime, date
@@ -5,15 +6,48 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import UniqueConstraint
 
 from . import db
+from .money import Money
 
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    # Integer centavos in the database, a Decimal in Python (see board.money)
+    amount = db.Column(Money, nullable=False)
     description = db.Column(db.String(200), nullable=False)
     source = db.Column(db.String(50), nullable=False)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # Set on the Python side (UTC, like CURRENT_TIMESTAMP) so every row is stored in the
+    # same format SQLAlchemy binds comparisons with; the feed's keyset filter relies on it
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Set by board.categories when the transaction is added
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+
+    category = db.relationship('Category')
+
+    # Composite indexes backing the keyset-paginated transaction feed and the per-category
+    # totals; amount rides along so category sums are answered from the index alone
+    __table_args__ = (
+        db.Index('ix_transaction_user_created_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_transaction_user_category_created', 'user_id', 'category_id', 'created_at', 'amount'),
+    )
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the transaction."""
+        return {
+            'id': self.id,
+            'description': self.description,
+            'amount': self.amount,
+            'type': self.type,
+            'source': self.source,
+            'category': self.category.name if self.category else None,
+            'created_at': self.created_at.isoformat()
+        }
+
+# A spending or income category; see board.categories for how transactions are matched to one
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    kind = db.Column(db.String(10), nullable=False)  # "income", "expense" or "transfer" (goal savings)
 
 # IMPORTANT: User model now inherits from both db.Model and UserMixin
 class User(db.Model, UserMixin):
@@ -49,8 +83,88 @@ class User(db.Model, UserMixin):
 class Goal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, nullable=False, default=0.0)
+    target_amount = db.Column(Money, nullable=False)
+    current_amount = db.Column(Money, nullable=False, default=0)
     priority = db.Column(db.Integer, nullable=False) # Represented as a percentage (1-100)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
\ No newline at end of file
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+# Running per-user totals, kept in step with every transaction insert
+class Ledger(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    income = db.Column(Money, nullable=False, default=0)
+    expense = db.Column(Money, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def balance(self):
+        return self.income - self.expense
+
+
+# One row per user per day with that day's totals and the balance at its close
+class DailyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    income = db.Column(Money, nullable=False, default=0)
+    expense = db.Column(Money, nullable=False, default=0)
+    closing_balance = db.Column(Money, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day', name='_user_day_uc'),
+    )
+
+
+# A receipt scan handed to the background OCR workers
+class OcrJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, done or failed
+    filename = db.Column(db.String(255), nullable=False)
+    result = db.Column(db.Text) # JSON list of the parsed transactions
+    error = db.Column(db.String(255))
+    warning = db.Column(db.String(255)) # e.g. likely duplicate transactions
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        """Returns the job's status and, once finished, the transactions it added."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'transactions': json.loads(self.result) if self.result else [],
+            'error': self.error,
+            'warning': self.warning,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+# A stock position; replaces the holdings list that used to live in the session cookie
+class Holding(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    symbol = db.Column(db.String(16), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'symbol', name='_user_symbol_uc'),
+    )
+
+    def to_dict(self):
+        """Returns the holding in the shape the investment tracker expects."""
+        return {'symbol': self.symbol, 'quantity': self.quantity}
+
+
+# Daily closing price (USD) of a symbol, shared by every user holding it
+class PriceSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(16), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('symbol', 'day', name='_symbol_day_uc'),
+    )
@@ -0,0 +1,79 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal("0.01")
+
+# Money columns are BigInteger centavos (up to 2**63 - 1). Single amounts are
+# capped far below that so ledger totals and SUM() over a user's history can't
+# overflow either.
+MAX_AMOUNT = Decimal("999999999999.99")
+
+def to_decimal(value):
+    """
+    Returns an amount as a Decimal rounded to the centavo. Accepts Decimals,
+    ints, numeric strings and floats (read by their shortest repr, so 0.1
+    stays 0.10 rather than 0.1000000000000000055...).
+
+    Raises:
+        ValueError: If the value isn't a finite number, or is too large to
+            store in a Money column.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'")
+    if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"Amount out of range: '{value}'")
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def parse_form_amount(text):
+    """
+    Reads an amount typed into a form.
+
+    Raises:
+        ValueError: If it isn't a finite, non-negative amount that fits in a
+            Money column; the message can be shown to the user.
+    """
+    try:
+        amount = to_decimal(text.strip())
+    except ValueError:
+        raise ValueError("Please enter a valid amount.")
+    if amount < 0:
+        raise ValueError("The amount can't be negative.")
+    return amount
+
+def to_centavos(value):
+    """Returns an amount as a whole number of centavos."""
+    return int(to_decimal(value) * 100)
+
+def from_centavos(centavos):
+    """Returns a whole number of centavos as a Decimal amount."""
+    return (Decimal(int(centavos)) / 100).quantize(CENT)
+
+class Money(TypeDecorator):
+    """
+    A peso amount stored as integer centavos and read back as a Decimal, so
+    sums are exact integer arithmetic in the database and in Python.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_centavos(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_centavos(value)
+
+class JSONProvider(DefaultJSONProvider):
+    """Serializes Decimal amounts as JSON numbers so the charts and feeds keep getting numbers, not strings."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
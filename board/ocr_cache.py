@@ -0,0 +1,84 @@
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+
+def hash_image(data):
+    """Returns the SHA-256 hex digest used as an image's cache key."""
+    return hashlib.sha256(data).hexdigest()
+
+class OcrCache:
+    """
+    Caches OCR results by the hash of the image bytes so a re-uploaded
+    receipt skips the scan. Entries live in their own SQLite file, so they
+    survive restarts and are shared by every worker. Entries older than
+    max_age_days are dropped, and the least recently used entries are
+    evicted once there are more than max_entries.
+
+    Each entry records the parser version it was produced with; entries
+    from another version are treated as misses.
+    """
+
+    def __init__(self, path, version, max_entries=10000, max_age_days=90):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 24 * 60 * 60
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                "digest TEXT PRIMARY KEY, version INTEGER NOT NULL, text TEXT NOT NULL, "
+                "transactions TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_used ON ocr_cache (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the cache safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, digest):
+        """
+        Returns the cached result for an image hash, or None on a miss.
+
+        Returns:
+            dict: {"text": str, "transactions": list}
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT text, transactions FROM ocr_cache WHERE digest = ? AND version = ? AND created_at >= ?",
+                (digest, self.version, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE ocr_cache SET last_used = ? WHERE digest = ?", (now, digest))
+
+        return {"text": row[0], "transactions": json.loads(row[1])}
+
+    def put(self, digest, text, transactions):
+        """Stores the result for an image hash and evicts expired or excess entries."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (digest, version, text, transactions, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, self.version, text, json.dumps(transactions), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM ocr_cache WHERE created_at < ?", (now - self.max_age,))
+        conn.execute(
+            "DELETE FROM ocr_cache WHERE digest IN ("
+            "SELECT digest FROM ocr_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import update
+
+from board.models import db, OcrJob, Transaction
+from board.ocr_utils import (
+    process_image_for_ocr, process_images_batched, parse_transaction_from_text,
+    DEFAULT_PREPROCESS, PARSER_VERSION
+)
+from board.ocr_cache import OcrCache
+from board import ledger, money
+
+# Earlier OCR transactions with the same amount within this window are flagged as likely duplicates
+DUPLICATE_WINDOW = timedelta(days=30)
+
+def scan_receipts(images, batch_size=8, preprocess=None):
+    """
+    Runs OCR on uploaded receipts and parses them. Executed inside a worker process.
+    Several receipts go through EasyOCR's batched inference together.
+
+    Args:
+        images (list): The encoded image bytes of each receipt.
+
+    Returns:
+        list: One {"text": str, "transactions": list} dict per receipt, in input order.
+    """
+    if len(images) == 1:
+        texts = [process_image_for_ocr(images[0], preprocess)]
+    else:
+        texts = process_images_batched(images, batch_size, preprocess)
+
+    return [{"text": text, "transactions": parse_transaction_from_text(text) or []} for text in texts]
+
+class OcrQueue:
+    """
+    Runs receipt scans on a pool of worker processes so OCR inference never
+    blocks a web request. Job state lives in the ocr_job table, so any web
+    worker can answer a status poll. When a scan finishes, its transactions
+    are committed together with the job's final status.
+
+    Results are cached by image hash (see OcrCache), so a receipt that was
+    already scanned completes immediately without reaching the workers.
+
+    Set OCR_WORKERS to the number of worker processes, or 0 to scan inline
+    in the request (useful for development). OCR_BATCH_SIZE caps how many
+    receipts of a multi-file upload share one inference call, and
+    OCR_MAX_FILES caps the number of receipts per upload. OCR_PREPROCESS
+    holds the image preprocessing options (None disables preprocessing).
+    OCR_CACHE_PATH locates the result cache (None disables it). Jobs still
+    queued after OCR_JOB_TIMEOUT_MINUTES (their worker or web process died)
+    are marked failed when they are next looked up. With
+    OCR_SERVER_ADDRESS set, OCR_SERVER_AUTHKEY must be set too.
+
+    Receipts are scanned from memory. Set OCR_ARCHIVE_UPLOADS to also keep a
+    copy of each receipt in UPLOAD_FOLDER; `flask ocr cleanup-uploads`
+    deletes archived receipts older than OCR_ARCHIVE_MAX_AGE_DAYS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._cache = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("OCR_WORKERS", 2)
+        app.config.setdefault("OCR_BATCH_SIZE", 8)
+        app.config.setdefault("OCR_MAX_FILES", 50)
+        app.config.setdefault("OCR_PREPROCESS", dict(DEFAULT_PREPROCESS))
+        app.config.setdefault("OCR_CACHE_PATH", os.path.join(app.instance_path, "ocr_cache.sqlite3"))
+        app.config.setdefault("OCR_CACHE_MAX_ENTRIES", 10000)
+        app.config.setdefault("OCR_CACHE_MAX_AGE_DAYS", 90)
+        app.config.setdefault("OCR_ARCHIVE_UPLOADS", False)
+        app.config.setdefault("OCR_ARCHIVE_MAX_AGE_DAYS", 30)
+        app.config.setdefault("OCR_JOB_TIMEOUT_MINUTES", 15)
+        app.extensions["ocr_queue"] = self
+        self.app = app
+
+        # Refuse to start rather than talk to an OCR server without an authkey
+        if os.getenv("OCR_SERVER_ADDRESS") and not os.getenv("OCR_SERVER_AUTHKEY"):
+            raise RuntimeError("OCR_SERVER_ADDRESS is set but OCR_SERVER_AUTHKEY is not; set it to a long random secret.")
+
+    @property
+    def cache(self):
+        # Opened on first use so CLI commands don't create the cache file
+        if self._cache is None and self.app.config["OCR_CACHE_PATH"]:
+            self._cache = OcrCache(
+                self.app.config["OCR_CACHE_PATH"],
+                PARSER_VERSION,
+                max_entries=self.app.config["OCR_CACHE_MAX_ENTRIES"],
+                max_age_days=self.app.config["OCR_CACHE_MAX_AGE_DAYS"]
+            )
+        return self._cache
+
+    @property
+    def executor(self):
+        # Started on first use so CLI commands and idle workers don't spawn processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.app.config["OCR_WORKERS"],
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, user_id, images, filename, digests):
+        """
+        Creates one job for one or more uploaded receipts and queues the receipts
+        that are not already in the cache for scanning.
+
+        Args:
+            images (list): The encoded image bytes of each receipt.
+            digests (list): The hash of each image's bytes, in the same order as images.
+
+        Returns:
+            OcrJob: The new job (already committed).
+        """
+        job = OcrJob(id=uuid.uuid4().hex, user_id=user_id, filename=filename)
+        db.session.add(job)
+        db.session.commit()
+
+        cached = [self.cache.get(digest) if self.cache else None for digest in digests]
+        hits = [result for result in cached if result is not None]
+        pending = [(image, digest) for image, digest, result in zip(images, digests, cached) if result is None]
+
+        if not pending:
+            self._finish(job.id, hits)
+            return job
+
+        pending_images = [image for image, _ in pending]
+        pending_digests = [digest for _, digest in pending]
+        args = (pending_images, self.app.config["OCR_BATCH_SIZE"], self.app.config["OCR_PREPROCESS"])
+
+        if self.app.config["OCR_WORKERS"] <= 0:
+            try:
+                results = scan_receipts(*args)
+            except Exception as e:
+                self._finish(job.id, error=e)
+            else:
+                self._finish(job.id, hits + self._store(pending_digests, results))
+            return job
+
+        future = self.executor.submit(scan_receipts, *args)
+        future.add_done_callback(lambda f, job_id=job.id: self._on_done(job_id, f, hits, pending_digests))
+        return job
+
+    def expire_stale(self, user_id):
+        """
+        Marks a user's jobs that have been queued longer than
+        OCR_JOB_TIMEOUT_MINUTES as failed, so clients stop waiting for them.
+
+        Returns:
+            int: The number of jobs marked failed.
+        """
+        cutoff = datetime.utcnow() - timedelta(minutes=self.app.config["OCR_JOB_TIMEOUT_MINUTES"])
+        result = db.session.execute(
+            update(OcrJob)
+            .where(OcrJob.user_id == user_id, OcrJob.status == "queued", OcrJob.created_at < cutoff)
+            .values(status="failed", error="The scan timed out. Please upload the receipt again.",
+                    finished_at=datetime.utcnow())
+        )
+        if result.rowcount:
+            db.session.commit()
+        return result.rowcount
+
+    def _on_done(self, job_id, future, hits, digests):
+        # Runs on the executor's callback thread, outside any request
+        with self.app.app_context():
+            error = future.exception()
+            if error is not None:
+                self.app.logger.error(f"OCR job {job_id} failed: {error}")
+                self._finish(job_id, error=error)
+            else:
+                self._finish(job_id, hits + self._store(digests, future.result()))
+
+    def _store(self, digests, results):
+        if self.cache:
+            for digest, result in zip(digests, results):
+                # An empty scan is more likely a failed read than a blank receipt; don't pin it
+                if result["text"]:
+                    self.cache.put(digest, result["text"], result["transactions"])
+        return results
+
+    def _finish(self, job_id, results=None, error=None):
+        """Commits the parsed transactions (one bulk insert) and the job's final status together."""
+        job = db.session.get(OcrJob, job_id)
+        if job.status != "queued":
+            # Timed out while waiting; the user was told to upload again, so don't add it twice
+            self.app.logger.warning(f"OCR job {job_id} finished after it was marked {job.status}; discarding")
+            return
+
+        if error is not None:
+            job.status = "failed"
+            job.error = str(error)[:255]
+        else:
+            transactions = [tx for result in results for tx in result["transactions"]]
+            duplicates = count_likely_duplicates(job.user_id, transactions)
+            if duplicates:
+                job.warning = (
+                    f"{duplicates} transaction(s) match OCR scans from the last "
+                    f"{DUPLICATE_WINDOW.days} days and may be duplicates."
+                )
+
+            ledger.add_transactions(job.user_id, transactions)
+            job.status = "done"
+            job.result = json.dumps(transactions)
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+def count_likely_duplicates(user_id, transactions):
+    """Counts parsed transactions whose amount matches a recent OCR transaction of the same type."""
+    if not transactions:
+        return 0
+
+    recent = db.session.query(Transaction.type, Transaction.amount).filter(
+        Transaction.user_id == user_id,
+        Transaction.source == "OCR Scan",
+        Transaction.created_at >= datetime.utcnow() - DUPLICATE_WINDOW,
+        Transaction.amount.in_({tx["amount"] for tx in transactions})
+    ).all()
+    seen = set(recent)
+    return sum(1 for tx in transactions if (tx["type"], money.to_decimal(tx["amount"])) in seen)
+
+def archive_upload(folder, data, digest, filename):
+    """
+    Keeps a copy of an uploaded receipt, named by its hash so identical
+    uploads share one file and different uploads never overwrite each other.
+
+    Returns:
+        str: The path of the archived file.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    path = os.path.join(folder, f"{digest}{extension}")
+
+    if os.path.exists(path):
+        # Re-uploads restart the retention clock
+        os.utime(path)
+        return path
+
+    # Write to a temporary name first so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return path
+
+def purge_archive(folder, max_age_days):
+    """
+    Deletes archived receipts that were last uploaded more than max_age_days ago.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    cutoff = time.time() - max_age_days * 24 * 60 * 60
+    deleted = 0
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                deleted += 1
+    return deleted
+
+ocr_queue = OcrQueue()
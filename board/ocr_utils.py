@@ -1,77 +1,456 @@
+import os
 import re
-import easyocr
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+import cv2
 import numpy as np
 from PIL import Image
 
-# Initialize the EasyOCR reader with the desired languages
-# This can be done once and reused for all requests for better performance.
-try:
-    reader = easyocr.Reader(['en'])
-except Exception as e:
-    print(f"Error initializing EasyOCR: {e}")
-    # Handle the error gracefully, e.g., by creating a dummy reader or logging.
-    reader = None
+# Bump whenever OCR output or parsing changes so cached results are re-scanned
+PARSER_VERSION = 2
 
-def process_image_for_ocr(image_path):
+logger = logging.getLogger(__name__)
+
+# The EasyOCR model (and PyTorch with it) is loaded on first use rather than at
+# import, so app start-up, CLI commands and processes that never scan a receipt
+# don't pay for it.
+_reader = None
+_reader_lock = threading.Lock()
+
+def get_reader():
+    """
+    Returns this process's EasyOCR reader, loading the model on first use.
+    Safe to call from several threads; the model is only loaded once.
+
+    Returns:
+        easyocr.Reader: The reader, or None if EasyOCR could not be initialized.
+    """
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                try:
+                    import easyocr
+                    _reader = easyocr.Reader(['en'])
+                except Exception as e:
+                    logger.error(f"Error initializing EasyOCR: {e}")
+    return _reader
+
+class SharedReader:
+    """Serializes access to the one reader hosted by the OCR server."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def readtext(self, image, **kwargs):
+        reader = get_reader()
+        if reader is None:
+            raise RuntimeError("EasyOCR reader is not initialized on the OCR server.")
+        with self._lock:
+            return reader.readtext(image, **kwargs)
+
+    def readtext_batched(self, images, **kwargs):
+        reader = get_reader()
+        if reader is None:
+            raise RuntimeError("EasyOCR reader is not initialized on the OCR server.")
+        with self._lock:
+            return reader.readtext_batched(images, **kwargs)
+
+class OcrManager(BaseManager):
+    pass
+
+# When OCR_SERVER_ADDRESS (host:port) is set, web and queue workers send images
+# to one dedicated OCR process instead of each holding a copy of the model.
+# The manager unpickles whatever its clients send, so OCR_SERVER_AUTHKEY is
+# required and the server should only listen on 127.0.0.1.
+_remote_reader = None
+_remote_lock = threading.Lock()
+
+def _server_config():
+    """
+    Reads the OCR server's address and authkey from the environment.
+
+    Raises:
+        RuntimeError: If OCR_SERVER_AUTHKEY is not set.
+    """
+    authkey = os.getenv("OCR_SERVER_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("Set OCR_SERVER_AUTHKEY to a long random secret to use the OCR server.")
+    host, port = os.getenv("OCR_SERVER_ADDRESS").rsplit(":", 1)
+    return (host, int(port)), authkey.encode()
+
+def serve_ocr():
+    """Hosts a single shared reader for OCR_SERVER_ADDRESS. Blocks forever."""
+    # Check the configuration before spending time loading the model
+    address, authkey = _server_config()
+    shared_reader = SharedReader()
+    OcrManager.register("get_reader", callable=lambda: shared_reader)
+
+    # Load the model before accepting connections so the first scan isn't slow
+    get_reader()
+
+    manager = OcrManager(address=address, authkey=authkey)
+    manager.get_server().serve_forever()
+
+def get_remote_reader():
+    """Returns a proxy to the OCR server's reader, connecting on first use."""
+    global _remote_reader
+    if _remote_reader is None:
+        with _remote_lock:
+            if _remote_reader is None:
+                OcrManager.register("get_reader")
+                address, authkey = _server_config()
+                manager = OcrManager(address=address, authkey=authkey)
+                manager.connect()
+                _remote_reader = manager.get_reader()
+    return _remote_reader
+
+def _call_reader(method, *args):
+    # Runs a reader method locally, or on the OCR server when one is configured
+    global _remote_reader
+    if os.getenv("OCR_SERVER_ADDRESS"):
+        try:
+            return getattr(get_remote_reader(), method)(*args)
+        except (ConnectionError, EOFError):
+            # The server restarted; reconnect once
+            _remote_reader = None
+            return getattr(get_remote_reader(), method)(*args)
+
+    reader = get_reader()
+    if reader is None:
+        raise RuntimeError("EasyOCR reader is not initialized. Cannot process image.")
+    return getattr(reader, method)(*args)
+
+# Default preprocessing applied before OCR; each step can be switched off, and
+# passing preprocess=None skips the stage entirely.
+DEFAULT_PREPROCESS = {
+    "max_side": 1600,           # Downscale so the longest side is at most this many pixels
+    "grayscale": True,
+    "normalize_contrast": True, # CLAHE on the grayscale image
+    "crop": True,               # Crop to the bright paper region of the photo
+    "deskew": True,             # Straighten text rotated by less than 45 degrees
+}
+
+def preprocess_image(image, options=None):
+    """
+    Prepares a receipt photo for OCR. Phone photos are far larger than
+    detection needs, so bounding the size is where most of the time is saved.
+
+    Args:
+        image (numpy.ndarray): RGB image.
+        options (dict): Steps to apply; see DEFAULT_PREPROCESS.
+
+    Returns:
+        numpy.ndarray: The processed image (single channel if grayscale is on).
+    """
+    options = {**DEFAULT_PREPROCESS, **(options or {})}
+
+    max_side = options.get("max_side")
+    if max_side and max(image.shape[:2]) > max_side:
+        scale = max_side / max(image.shape[:2])
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    receipt = _find_receipt_contour(gray) if options.get("crop") or options.get("deskew") else None
+
+    if options.get("deskew"):
+        # The paper's outline is the most reliable skew signal; fall back to the text itself
+        angle = _normalize_angle(cv2.minAreaRect(receipt)[-1]) if receipt is not None else _estimate_skew(gray)
+        if angle:
+            gray = _rotate(gray, angle)
+            image = _rotate(image, angle)
+            receipt = _find_receipt_contour(gray) if options.get("crop") else None
+
+    if options.get("crop") and receipt is not None:
+        x, y, w, h = cv2.boundingRect(receipt)
+        gray = gray[y:y + h, x:x + w]
+        image = image[y:y + h, x:x + w]
+
+    if not options.get("grayscale"):
+        return image
+
+    if options.get("normalize_contrast"):
+        gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+
+    return gray
+
+def _find_receipt_contour(gray):
+    # The receipt is usually the largest bright region; returns None if nothing
+    # convincing is found so the whole image is kept
+    height, width = gray.shape
+    _, mask = cv2.threshold(cv2.GaussianBlur(gray, (5, 5), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    contour = max(contours, key=cv2.contourArea)
+    _, _, w, h = cv2.boundingRect(contour)
+    if cv2.contourArea(contour) < 0.2 * width * height or w * h > 0.98 * width * height:
+        return None
+    return contour
+
+def _normalize_angle(angle):
+    # minAreaRect's angle convention differs between OpenCV versions; map it to a rotation in (-45, 45]
+    angle %= 90
+    if angle > 45:
+        angle -= 90
+    return angle if 0.5 <= abs(angle) < 45 else 0
+
+def _estimate_skew(gray):
+    # Angle of the minimum-area rectangle around the dark (text) pixels
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(ink)
+    if coords is None:
+        return 0
+    return _normalize_angle(cv2.minAreaRect(coords)[-1])
+
+def _rotate(image, angle):
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+def process_image_for_ocr(image, preprocess=None):
     """
     Extracts text from an image using EasyOCR.
     
     Args:
-        image_path (str): The path to the image file.
+        image (str | bytes): The path to the image file, or the encoded image itself.
+        preprocess (dict): Preprocessing options (see DEFAULT_PREPROCESS), or
+            None to hand the image to EasyOCR as-is.
         
     Returns:
-        str: A single string containing all the extracted text.
+        str: The extracted text, one receipt line per line.
+
+    Raises:
+        ValueError: If the image can't be decoded.
+        RuntimeError: If the EasyOCR reader isn't available.
     """
-    if reader is None:
-        print("EasyOCR reader is not initialized. Cannot process image.")
-        return ""
-        
+    if preprocess is not None:
+        image = preprocess_image(load_image(image), preprocess)
+
+    # EasyOCR's readtext function is very powerful and handles most pre-processing.
+    # It returns a list of tuples, with each tuple containing:
+    # ([bounding_box], text, confidence)
+    results = _call_reader("readtext", image)
+
+    # Rebuild the receipt's lines from the bounding boxes and join them
+    # with newlines so the parser can read one line at a time.
+    return "\n".join(group_lines(results))
+
+def load_image(source):
+    """
+    Decodes an image into an RGB NumPy array.
+
+    Args:
+        source (str | bytes): A path to the image file, or the encoded image
+            bytes (decoded in memory, without touching the disk).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        image = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Unsupported or corrupt image data.")
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    with Image.open(source) as image:
+        return np.array(image.convert("RGB"))
+
+def process_images_batched(images, batch_size=8, preprocess=None):
+    """
+    Extracts text from several images with EasyOCR's batched inference.
+    Images are decoded (and preprocessed) concurrently, then sorted by size
+    and sent through the model batch_size at a time. readtext_batched needs
+    equally sized inputs, and cropped receipts rarely match exactly, so each
+    image is padded at the bottom and right to the largest in its batch.
+
+    Args:
+        images (list): Paths to the image files, or the encoded images themselves.
+        batch_size (int): Maximum number of images per inference call.
+        preprocess (dict): Preprocessing options, or None to skip preprocessing.
+
+    Returns:
+        list: The extracted text for each image, in input order ("" for
+        images that could not be decoded).
+
+    Raises:
+        ValueError: If none of the images can be decoded.
+        RuntimeError: If the EasyOCR reader isn't available.
+    """
+    texts = [""] * len(images)
+
+    with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1) or 1) as pool:
+        images = list(pool.map(lambda source: _try_load_image(source, preprocess), images))
+
+    # Only grayscale and colour images can't share a batch; similar sizes go together to keep padding small
+    by_channels = defaultdict(list)
+    for index, image in enumerate(images):
+        if image is not None:
+            by_channels[image.shape[2:]].append(index)
+    if not by_channels:
+        raise ValueError("None of the uploaded images could be decoded.")
+
+    for indices in by_channels.values():
+        indices.sort(key=lambda i: images[i].shape[:2])
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            height = max(images[i].shape[0] for i in batch)
+            width = max(images[i].shape[1] for i in batch)
+            results = _call_reader("readtext_batched", [_pad(images[i], height, width) for i in batch])
+            for index, result in zip(batch, results):
+                texts[index] = "\n".join(group_lines(result))
+
+    return texts
+
+def _pad(image, height, width):
+    # Padding goes below and to the right so the boxes EasyOCR returns still
+    # match the original image; white blends in with the receipt paper
+    if image.shape[:2] == (height, width):
+        return image
+    padding = ((0, height - image.shape[0]), (0, width - image.shape[1])) + ((0, 0),) * (image.ndim - 2)
+    return np.pad(image, padding, mode="constant", constant_values=255)
+
+def _try_load_image(source, preprocess=None):
     try:
-        # EasyOCR's readtext function is very powerful and handles most pre-processing.
-        # It returns a list of tuples, with each tuple containing:
-        # ([bounding_box], text, confidence)
-        results = reader.readtext(image_path)
-        
-        # We need to extract the text from the results and join them.
-        # Using a newline character to separate lines can help the parser.
-        extracted_text = " ".join([text[1] for text in results])
-        
-        return extracted_text
-        
+        image = load_image(source)
+        return preprocess_image(image, preprocess) if preprocess is not None else image
     except Exception as e:
-        print(f"Error processing image with EasyOCR: {e}")
-        return ""
+        logger.warning(f"Error decoding image: {e}")
+        return None
 
-def parse_transaction_from_text(text):
+# Receipt parsing. Every pattern is compiled once and written without nested or
+# overlapping quantifiers, so matching stays linear in the length of a line;
+# lines are also capped so a garbage scan can't make parsing expensive.
+MAX_LINES = 300
+MAX_LINE_LENGTH = 200
+
+# An amount: optional currency marker, digits with optional thousands separators, optional centavos
+AMOUNT_RE = re.compile(r"(?<![\w.,])(₱|PHP|P)?\s?(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d{2}))?(?![\w.,])", re.IGNORECASE)
+
+# Numbers that are never amounts; these spans are blanked out before looking for amounts
+NOISE_RES = [
+    # Dates
+    re.compile(r"\b\d{1,4}[/-]\d{1,2}[/-]\d{2,4}\b"),
+    # Times
+    re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?(?:\s?[AP]M)?\b", re.IGNORECASE),
+    # TINs
+    re.compile(r"\b\d{3}-\d{3}-\d{3}(?:-\d{3,5})?\b"),
+    # Mobile numbers
+    re.compile(r"(?:\+63|\b0)9\d{2}[\s-]?\d{3}[\s-]?\d{4}\b"),
+    # Landlines
+    re.compile(r"\(0\d{1,2}\)\s?\d{3,4}[\s-]?\d{4}\b"),
+]
+
+# Lines whose numbers are identifiers or counts, never money
+IGNORE_LINE_RE = re.compile(
+    r"\b(?:tin|tel|phone|mobile|contact|vat\s+reg|min|s/?n|serial|permit|ptu|accred\w*|"
+    r"o\.?r\.?\s*(?:no|#)|invoice\s*(?:no|#)|receipt\s*(?:no|#)|trans\w*\s*(?:no|#)|"
+    r"card\s*(?:no|#)|items?|qty|quantity|cash(?:ier)?|change|tender\w*|terminal|pos\s*(?:no|#))\b",
+    re.IGNORECASE
+)
+SUBTOTAL_RE = re.compile(r"\bsub[\s-]?total\b", re.IGNORECASE)
+TOTAL_RE = re.compile(r"\b(?:grand\s+total|total\s+(?:amount|due|sales)|amount\s+due|net\s+(?:amount|total)|total)\b", re.IGNORECASE)
+# 'VAT inclusive' qualifies a total rather than marking a tax line
+VAT_RE = re.compile(r"\b(?:vat(?:able)?|tax|e-?vat)\b(?!\W*incl)", re.IGNORECASE)
+KEYWORD_RE = re.compile(r"\b(income|expense)\b", re.IGNORECASE)
+
+def group_lines(results):
     """
-    Parses OCR text to extract one or more transactions.
-    Detects 'income' and 'expense' with nearby numbers.
+    Rebuilds the lines of a receipt from EasyOCR's readtext output.
+    Boxes whose vertical centres are within half a line height of each other
+    are joined left to right; lines are returned top to bottom.
+
+    Args:
+        results (list): ([bounding_box], text, confidence) tuples.
+
+    Returns:
+        list: The text of each line.
     """
-    transactions = []
+    boxes = []
+    for box, text, _ in results:
+        ys = [point[1] for point in box]
+        boxes.append(((min(ys) + max(ys)) / 2, max(max(ys) - min(ys), 1), min(point[0] for point in box), text))
+    boxes.sort()
 
-    # Regex: optional keyword + optional ₱/PHP/P + number
-    pattern = r"(income|expense)?\s*(?:₱|PHP|P)?\s*([\d,]+\.?\d{0,2})"
+    lines = []
+    for centre, height, left, text in boxes:
+        if lines and abs(centre - lines[-1]["centre"]) <= max(height, lines[-1]["height"]) / 2:
+            lines[-1]["words"].append((left, text))
+        else:
+            lines.append({"centre": centre, "height": height, "words": [(left, text)]})
 
-    matches = re.findall(pattern, text, re.IGNORECASE)
+    return [" ".join(text for _, text in sorted(line["words"])) for line in lines]
 
-    for keyword, amount_str in matches:
-        amount = float(amount_str.replace(",", ""))
+def _line_amounts(line):
+    """Returns the amounts on a line as (value, explicit) pairs, where explicit means it had a currency marker or centavos."""
+    for noise in NOISE_RES:
+        line = noise.sub(" ", line)
 
-        if keyword.lower() == "income":
-            t_type = "income"
-        elif keyword.lower() == "expense":
-            t_type = "expense"
-        else:
-            # If no explicit keyword, decide default
-            t_type = "expense"
+    amounts = []
+    for match in AMOUNT_RE.finditer(line):
+        currency, whole, cents = match.groups()
+        value = float(whole.replace(",", "") + ("." + cents if cents else ""))
+        amounts.append((value, bool(currency or cents)))
+    return amounts
+
+def _transaction(t_type, amount):
+    return {
+        "type": t_type,
+        "amount": amount,
+        "description": f"Scanned {t_type.capitalize()}",
+        "source": "OCR Scan"
+    }
+
+def parse_transaction_from_text(text):
+    """
+    Parses OCR text to extract one or more transactions, one line at a time.
+
+    A printed receipt becomes a single expense for its total (or its
+    subtotal when no total line was read). Notes that label amounts with
+    'income' or 'expense' yield one transaction per labelled line. Otherwise
+    each line with a currency-marked or decimal amount becomes an expense.
+    Dates, times, phone numbers, TINs, counts and reference numbers are ignored.
+
+    Args:
+        text (str): Newline-separated lines, as produced by group_lines.
+
+    Returns:
+        list: Transaction dicts, or None if nothing was found.
+    """
+    totals, subtotals, labelled, loose = [], [], [], []
+
+    for line in text.splitlines()[:MAX_LINES]:
+        line = line[:MAX_LINE_LENGTH]
+        keyword = KEYWORD_RE.search(line)
+        if not keyword and IGNORE_LINE_RE.search(line):
+            continue
+
+        amounts = _line_amounts(line)
+        if not amounts:
+            continue
+        # Receipt amounts are right-aligned, so the last number on a line is its value
+        amount, explicit = amounts[-1]
+        if amount <= 0:
+            continue
 
-        transactions.append({
-            "type": t_type,
-            "amount": amount,
-            "description": f"Scanned {t_type.capitalize()}",
-            "source": "OCR Scan"
-        })
+        if keyword:
+            labelled.append(_transaction(keyword.group(1).lower(), amount))
+        elif SUBTOTAL_RE.search(line):
+            subtotals.append(amount)
+        elif VAT_RE.search(line):
+            continue
+        elif TOTAL_RE.search(line):
+            totals.append(amount)
+        elif explicit:
+            loose.extend(_transaction("expense", value) for value, is_explicit in amounts if is_explicit and value > 0)
 
-    # Return list of transactions instead of just one
-    return transactions if transactions else None
+    if totals:
+        # 'Total' and 'Amount Due' usually repeat the same figure; the largest survives a misread
+        transactions = [_transaction("expense", max(totals))]
+    elif subtotals:
+        transactions = [_transaction("expense", max(subtotals))]
+    else:
+        transactions = labelled or loose
 
+    return transactions or None
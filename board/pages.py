@@ -1,78 +1,193 @@
-import os
+import base64
 import secrets
 import tempfile
-from flask import Blueprint, render_template, request, redirect, url_for, session, current_app, flash, jsonify
+import json
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, session, current_app, flash, jsonify,
+    copy_current_request_context, stream_with_context, Response
+)
 from flask_login import login_required, login_user, logout_user, current_user
 import markdown
 import requests
-from sqlalchemy import func
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-from werkzeug.utils import secure_filename
-from board.models import db, Transaction, User, Goal
-from board.ocr_utils import process_image_for_ocr, parse_transaction_from_text
-import yfinance as yf
+from board.models import db, Transaction, User, Goal, OcrJob, Holding
+from board.ocr_jobs import ocr_queue, archive_upload
+from board.ocr_cache import hash_image
+from board.market_data import market_data
+from board.fx_rates import fx_rates, FxRateUnavailable
+from board.upstreams import upstreams, UpstreamBusy, UpstreamTimeout
+from board import reports, ledger, price_history, advisor, goal_allocation, importer, exporter, money
 
 bp = Blueprint("pages", __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+# Page size for the transaction feed; the API caps client-requested sizes
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def encode_cursor(transaction):
+    """Encodes the (created_at, id) position of a transaction as an opaque cursor."""
+    raw = f"{transaction.created_at.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Decodes a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, tx_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(tx_id)
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def get_transaction_page(user_id, cursor=None, limit=FEED_PAGE_SIZE):
+    """
+    Fetches one page of a user's transactions, newest first, using keyset
+    pagination over (user_id, created_at, id).
+
+    Returns:
+        tuple: (list of Transaction, next cursor or None if this is the last page)
+    """
+    # The feed shows each transaction's category, so load them in the same query
+    query = Transaction.query.options(joinedload(Transaction.category)).filter_by(user_id=user_id)
+
+    if cursor:
+        created_at, tx_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Transaction.created_at < created_at,
+            and_(Transaction.created_at == created_at, Transaction.id < tx_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+    return page, next_cursor
+
 @bp.route("/")
 @login_required
 def index():
-    # Only show transactions for the currently logged-in user
-    transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.created_at.desc()).all()
-    
+    # Only the first page of the feed is rendered; the rest is loaded on demand
+    recent_transactions, next_cursor = get_transaction_page(current_user.id)
+
     # Fetch goals for the current user and order them by priority
     goals = Goal.query.filter_by(user_id=current_user.id).order_by(Goal.priority.desc()).all()
 
-    # Convert the list of SQLAlchemy objects into a list of dictionaries
-    # This makes the data JSON-serializable for the JavaScript in the template
-    transactions_for_json = [
-        {
-            'description': t.description,
-            'amount': t.amount,
-            'type': t.type,
-            'source': t.source,
-            'created_at': t.created_at.isoformat()
-        }
-        for t in transactions
-    ]
-
-    income = sum(t.amount for t in transactions if t.type == "income")
-    expense = sum(t.amount for t in transactions if t.type == "expense")
+    # Totals are read from the ledger; the charts fetch their pre-aggregated series from /api/reports
+    income, expense = ledger.get_totals(current_user.id)
     balance = income - expense
 
-    # Pass the JSON-serializable list and goals to the template
     return render_template("pages/index.html", 
-        transactions=transactions_for_json, 
+        recent_transactions=[t.to_dict() for t in recent_transactions],
+        next_cursor=next_cursor,
         balance=balance, 
         income=income, 
         expense=expense,
         goals=goals
     )
 
+@bp.route("/api/transactions")
+@login_required
+def get_transactions():
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", FEED_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, FEED_MAX_PAGE_SIZE))
+
+    try:
+        page, next_cursor = get_transaction_page(current_user.id, cursor, limit)
+    except ValueError:
+        return {"error": "Invalid cursor."}, 400
+
+    return jsonify({
+        "transactions": [t.to_dict() for t in page],
+        "next_cursor": next_cursor
+    })
+
+@bp.route("/api/transactions/export")
+@login_required
+def export_transactions():
+    fmt = request.args.get("format", "csv")
+    try:
+        start, end = reports.parse_date_range(request.args)
+        chunks = exporter.export(current_user.id, fmt, start, end)
+    except exporter.ExportUnavailable as e:
+        return {"error": str(e)}, 501
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Rows are read and sent batch by batch while the response streams
+    mimetype, extension = exporter.FORMATS[fmt]
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=transactions.{extension}"}
+    )
+
+@bp.route("/api/reports/expenses")
+@login_required
+def report_expenses():
+    try:
+        start, end = reports.parse_date_range(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify(reports.expense_breakdown(current_user.id, start, end))
+
+@bp.route("/api/reports/categories")
+@login_required
+def report_categories():
+    kind = request.args.get("kind", "expense")
+    if kind not in ("expense", "income"):
+        return {"error": "kind must be expense or income."}, 400
+    try:
+        start, end = reports.parse_date_range(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify(reports.category_breakdown(current_user.id, start, end, kind))
+
+@bp.route("/api/reports/daily")
+@login_required
+def report_daily():
+    try:
+        start, end = reports.parse_date_range(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify(reports.daily_flow(current_user.id, start, end))
+
+@bp.route("/api/reports/balance")
+@login_required
+def report_balance():
+    try:
+        start, end = reports.parse_date_range(request.args)
+        series = reports.cash_flow(current_user.id, start, end)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify(series)
+
 @bp.route("/add", methods=["POST"])
 @login_required
 def add_transaction():
     t_type = request.form["type"] 
-    amount = float(request.form["amount"])
+    try:
+        amount = money.parse_form_amount(request.form["amount"])
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("pages.index"))
     desc = request.form["description"]
     source = request.form.get("source", "N/A")
 
-    # Use the current_user provided by Flask-Login
-    new_transaction = Transaction(
-        type=t_type,
-        amount=amount,
-        description=desc,
-        source=source,
-        user_id=current_user.id
-    )
-
-    db.session.add(new_transaction)
+    # Insert the transaction and update the ledger in one commit
+    ledger.add_transactions(current_user.id, [{
+        "type": t_type,
+        "amount": amount,
+        "description": desc,
+        "source": source
+    }])
     db.session.commit()
 
     return redirect(url_for("pages.index"))
@@ -82,7 +197,11 @@ def add_transaction():
 @login_required
 def add_goal():
     name = request.form["name"]
-    target_amount = float(request.form["target_amount"])
+    try:
+        target_amount = money.parse_form_amount(request.form["target_amount"])
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("pages.index"))
     priority = int(request.form["priority"])
 
     new_goal = Goal(
@@ -102,92 +221,133 @@ def add_goal():
 @bp.route("/distribute_balance", methods=["POST"])
 @login_required
 def distribute_balance():
-    # Calculate the user's current balance
-    income = db.session.query(func.sum(Transaction.amount)).filter_by(user_id=current_user.id, type='income').scalar() or 0
-    expense = db.session.query(func.sum(Transaction.amount)).filter_by(user_id=current_user.id, type='expense').scalar() or 0
-    balance = income - expense
+    balance, distributions = goal_allocation.plan_distribution(current_user.id)
 
     if balance <= 0:
         flash("No balance to distribute.", "warning")
         return redirect(url_for("pages.index"))
 
-    # Get all goals for the user
-    goals = Goal.query.filter_by(user_id=current_user.id).all()
-    total_priority = sum(goal.priority for goal in goals)
-
-    if total_priority == 0:
-        flash("No goals with priorities set.", "warning")
+    if not distributions:
+        flash("No goals with priorities set that still need funds.", "warning")
         return redirect(url_for("pages.index"))
 
-    distributed_amount = 0
-    for goal in goals:
-        # Calculate the proportional amount to distribute to this goal
-        proportion = goal.priority / total_priority
-        amount_to_distribute = balance * proportion
-        
-        # Ensure we don't exceed the target amount
-        if goal.current_amount + amount_to_distribute > goal.target_amount:
-            amount_to_distribute = goal.target_amount - goal.current_amount
-        
-        if amount_to_distribute > 0:
-            goal.current_amount += amount_to_distribute
-            distributed_amount += amount_to_distribute
-
-            # Create a new "expense" transaction for the distribution
-            new_transaction = Transaction(
-                type='expense',
-                amount=amount_to_distribute,
-                description=f"Distributed to goal: {goal.name}",
-                source='Goal Distribution',
-                user_id=current_user.id
-            )
-            db.session.add(new_transaction)
-
+    distributed_amount = goal_allocation.apply_distribution(current_user.id, distributions)
     db.session.commit()
     flash(f"Successfully distributed ₱{distributed_amount:.2f} to your goals!", "success")
     return redirect(url_for("pages.index"))
 
+# Dry run of distribute_balance: shows the split without saving anything
+@bp.route("/api/goals/distribution_preview")
+@login_required
+def distribution_preview():
+    balance, distributions = goal_allocation.plan_distribution(current_user.id)
+    return jsonify({
+        "balance": balance,
+        "distributions": distributions,
+        "total": sum(d["amount"] for d in distributions)
+    })
+
+def enqueue_uploads(files):
+    """
+    Reads uploaded receipts into memory and queues them for background OCR
+    as one job. Receipts are only written to disk when archiving is enabled.
+    """
+    images = [file.read() for file in files]
+    digests = [hash_image(data) for data in images]
+
+    if current_app.config["OCR_ARCHIVE_UPLOADS"]:
+        for file, data, digest in zip(files, images, digests):
+            archive_upload(current_app.config["UPLOAD_FOLDER"], data, digest, file.filename)
+
+    filename = ", ".join(file.filename for file in files)[:255]
+    return ocr_queue.submit(current_user.id, images, filename, digests)
+
+def get_receipt_uploads():
+    """
+    Returns the uploaded receipt files and an error message (or None)
+    if the upload is empty or contains files that can't be scanned.
+    """
+    files = [file for file in request.files.getlist("file") if file.filename != ""]
+    if not files:
+        return files, "No file selected."
+    if len(files) > current_app.config["OCR_MAX_FILES"]:
+        return files, f"Upload at most {current_app.config['OCR_MAX_FILES']} receipts at a time."
+    if not all(allowed_file(file.filename) for file in files):
+        return files, "Only PNG and JPEG images can be scanned."
+    return files, None
+
 @bp.route("/ocr_upload", methods=["POST"])
 @login_required
 def ocr_upload():
-    if "file" not in request.files:
-        flash("No file uploaded.", "danger")
-        return redirect(url_for("pages.index"))
-
-    file = request.files["file"]
-    if file.filename == "":
-        flash("No file selected.", "danger")
+    files, error = get_receipt_uploads()
+    if error:
+        flash(error, "danger")
         return redirect(url_for("pages.index"))
 
-    # Save the uploaded file temporarily
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-    file.save(filepath)
+    # OCR runs in the background; the transactions are added when the scan finishes
+    job = enqueue_uploads(files)
 
-    # Run OCR
-    extracted_text = process_image_for_ocr(filepath)
-    transactions = parse_transaction_from_text(extracted_text)
+    if job.status == "failed":
+        flash("Failed to scan the receipt.", "danger")
+    elif job.status == "done":
+        transactions = job.to_dict()["transactions"]
+        if transactions:
+            flash(f"Added {len(transactions)} transaction(s) from OCR scan!", "success")
+        else:
+            flash("No transaction details found in scan.", "warning")
+        if job.warning:
+            flash(job.warning, "warning")
+    else:
+        flash(f"Scanning {len(files)} receipt(s). The transactions will appear shortly.", "info")
+    return redirect(url_for("pages.index"))
 
-    if not transactions:
-        flash("No transaction details found in scan.", "warning")
+@bp.route("/import_statement", methods=["POST"])
+@login_required
+def import_statement():
+    statement = request.files.get("statement")
+    fmt = importer.detect_format(statement.filename) if statement and statement.filename else None
+    if fmt is None:
+        flash("Please upload a CSV or OFX bank statement.", "danger")
         return redirect(url_for("pages.index"))
 
-    # Save each transaction for the logged-in user
-    for tx in transactions:
-        new_tx = Transaction(
-            type=tx["type"],
-            amount=tx["amount"],
-            description=tx["description"],
-            source=tx["source"],
-            user_id=current_user.id,
-        )
-        db.session.add(new_tx)
-
-    db.session.commit()
+    try:
+        result = importer.import_statement(current_user.id, statement.stream, fmt)
+    except importer.StatementError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("pages.index"))
 
-    flash(f"Added {len(transactions)} transaction(s) from OCR scan!", "success")
+    flash(
+        f"Imported {result['imported']} transaction(s); skipped {result['duplicates']} duplicate(s) "
+        f"and {result['invalid']} invalid row(s).",
+        "success" if result["imported"] else "warning"
+    )
+    for error in result["errors"][:5]:
+        flash(error, "warning")
     return redirect(url_for("pages.index"))
 
+@bp.route("/api/ocr_jobs", methods=["POST"])
+@login_required
+def create_ocr_job():
+    files, error = get_receipt_uploads()
+    if error:
+        return {"error": error}, 400
+
+    job = enqueue_uploads(files)
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for("pages.get_ocr_job", job_id=job.id)
+    }), 202
+
+@bp.route("/api/ocr_jobs/<job_id>")
+@login_required
+def get_ocr_job(job_id):
+    ocr_queue.expire_stale(current_user.id)
+    job = OcrJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if job is None:
+        return {"error": "Job not found."}, 404
+    return jsonify(job.to_dict())
+
 
 @bp.route("/register", methods=['GET', 'POST'])
 def register():
@@ -266,26 +426,12 @@ def logout():
 
 @bp.route("/advice")
 @login_required
-def advice():
-    transactions = Transaction.query.filter_by(user_id=current_user.id).all()
-
-    # Create a summary of transactions
-    transaction_summary = "Here are my transactions:\n"
-    for t in transactions:
-        transaction_summary += f"{t.type} - ₱{t.amount} ({t.description})\n"
-
-    # Add profile information for personalization
-    profile_info = (
-        f"My name is {current_user.full_name}, and my source of income is {current_user.income_source}. "
-        f"I am {current_user.age} years old."
-    )
-    
-    full_prompt = (
-        f"{transaction_summary}\n\n"
-        f"Based on this transaction history, and the following personal information:\n"
-        f"{profile_info}\n\n"
-        f"Please give me some smart and personalized budgeting advice."
-    )
+async def advice():
+    # Unchanged transactions and profile reuse the cached advice; otherwise the
+    # prompt carries either the full history or just what changed since then
+    cached, prompt, state = advisor.plan(current_user, current_app.config["ADVICE_PROMPT_TOKEN_BUDGET"])
+    if prompt is None:
+        return jsonify({"advice": cached.html, "cached": True})
 
     client = current_app.config['API_CLIENT']
     
@@ -293,13 +439,75 @@ def advice():
     if "MODEL_ID" in current_app.config:
         model_id = current_app.config["MODEL_ID"]
 
-    response = client.models.generate_content(
-        model=model_id,
-        contents=full_prompt
-    )
+    # Runs on the Gemini bulkhead so slow responses can't tie up every worker
+    try:
+        response = await upstreams["gemini"].call(
+            client.models.generate_content,
+            model=model_id,
+            contents=prompt
+        )
+    except UpstreamBusy as e:
+        return {"error": str(e)}, 503
+    except UpstreamTimeout as e:
+        return {"error": str(e)}, 504
     
     advice_text = markdown.markdown(response.text)
-    return jsonify({"advice": advice_text})
+    advisor.remember(current_user.id, state, response.text, advice_text)
+    return jsonify({"advice": advice_text, "cached": False})
+
+def sse(event, data):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route("/advice/stream")
+@login_required
+def advice_stream():
+    """
+    Streams advice as Server-Sent Events: "chunk" events carry markdown as
+    Gemini generates it, then a "done" (or "error") event ends the stream.
+    Cached advice is sent as a single chunk.
+    """
+    cached, prompt, state = advisor.plan(current_user, current_app.config["ADVICE_PROMPT_TOKEN_BUDGET"])
+    user_id = current_user.id
+    client = current_app.config['API_CLIENT']
+    model_id = current_app.config.get("MODEL_ID", "gemini-2.5-flash-lite")
+
+    def events():
+        if prompt is None:
+            yield sse("chunk", {"text": cached.text})
+            yield sse("done", {"cached": True})
+            return
+
+        parts = []
+        try:
+            for chunk in upstreams["gemini"].stream(client.models.generate_content_stream, model=model_id, contents=prompt):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield sse("chunk", {"text": chunk.text})
+        except (UpstreamBusy, UpstreamTimeout) as e:
+            yield sse("error", {"error": str(e)})
+            return
+        except Exception as e:
+            current_app.logger.error(f"Advice stream failed: {e}")
+            yield sse("error", {"error": "Failed to generate advice."})
+            return
+
+        text = "".join(parts)
+        advisor.remember(user_id, state, text, markdown.markdown(text))
+        yield sse("done", {"cached": False})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@bp.route("/api/advice/stats")
+@login_required
+def advice_stats():
+    """Reports this worker's advice cache hit rate."""
+    return jsonify(advisor.advice_cache.stats())
 
 @bp.route("/profile", methods=['GET', 'POST'])
 @login_required
@@ -314,30 +522,41 @@ def profile():
     
     return render_template('pages/profile.html', user=current_user)
 
+def get_holdings(user_id):
+    """Returns a user's holdings, oldest first."""
+    return Holding.query.filter_by(user_id=user_id).order_by(Holding.id).all()
+
+def add_holding(user_id, symbol, quantity):
+    """Adds quantity to the user's holding of symbol, creating it if needed. Doesn't commit."""
+    holding = Holding.query.filter_by(user_id=user_id, symbol=symbol).first()
+    if holding is None:
+        db.session.add(Holding(user_id=user_id, symbol=symbol, quantity=quantity))
+    else:
+        holding.quantity += quantity
+
+def import_session_holdings():
+    # Holdings used to be kept in the session cookie; move any that are left into the database
+    items = session.pop("investments", None)
+    if items:
+        for item in items:
+            add_holding(current_user.id, item["symbol"].upper(), item["quantity"])
+        db.session.commit()
+
 @bp.route("/investments")
 @login_required
 def investments():
-    # Initialize investments in the session if it doesn't exist
-    if 'investments' not in session:
-        session['investments'] = []
-    
-    # Pass the investments from the session to the template
-    return render_template("pages/investment_tracker.html", holdings=session['investments'])
+    import_session_holdings()
+    holdings = [holding.to_dict() for holding in get_holdings(current_user.id)]
+    return render_template("pages/investment_tracker.html", holdings=holdings)
 
 @bp.route("/api/stock/<symbol>")
 @login_required
-def get_stock_data(symbol):
-    import yfinance as yf
+async def get_stock_data(symbol):
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        hist = ticker.history(period="1d")
-
-        if hist.empty:
-            return {"error": f"No data found for {symbol}"}, 404
+        quote = await upstreams["market_data"].call(market_data.quote, symbol)
 
-        price_usd = hist["Close"].iloc[-1]
-        prev_close_usd = hist["Close"].iloc[-2] if len(hist) > 1 else price_usd
+        price_usd = quote["price"]
+        prev_close_usd = quote["previous_close"]
 
         daily_change_usd = price_usd - prev_close_usd
         change_percent = (daily_change_usd / prev_close_usd) * 100 if prev_close_usd else 0
@@ -345,20 +564,82 @@ def get_stock_data(symbol):
         # Convert to PHP
         usd_to_php = get_usd_to_php()
         price_php = price_usd * usd_to_php
-        daily_change_php = daily_change_usd
+        daily_change_php = daily_change_usd * usd_to_php
 
         return jsonify({
-            "name": info.get("longName", symbol),
+            "name": quote["name"],
             "price": price_php,
             "daily_change": daily_change_php,
             "change_percent": change_percent,
-            "sector": info.get("sector", "N/A"),
-            "market_cap": info.get("marketCap", 0)
+            "sector": quote["sector"],
+            "market_cap": quote["market_cap"]
         })
+    except (FxRateUnavailable, UpstreamBusy) as e:
+        return {"error": str(e)}, 503
+    except UpstreamTimeout as e:
+        return {"error": str(e)}, 504
+    except LookupError as e:
+        return {"error": str(e)}, 404
     except Exception as e:
         current_app.logger.error(f"Failed to fetch stock data for {symbol}: {e}")
         return {"error": "Failed to fetch stock data."}, 500
 
+@bp.route("/api/portfolio")
+@login_required
+async def get_portfolio():
+    """
+    Values the user's holdings (from the holding table) in PHP. Prices for
+    all holdings come from one batched download instead of one round-trip
+    per holding.
+    """
+    holdings = [holding.to_dict() for holding in get_holdings(current_user.id)]
+    try:
+        usd_to_php, fx_as_of = fx_rates.get()
+        quotes = await upstreams["market_data"].call(
+            market_data.portfolio_quotes, [item["symbol"] for item in holdings]
+        )
+    except (FxRateUnavailable, UpstreamBusy) as e:
+        return {"error": str(e)}, 503
+    except UpstreamTimeout as e:
+        return {"error": str(e)}, 504
+    except Exception as e:
+        current_app.logger.error(f"Failed to value portfolio: {e}")
+        return {"error": "Failed to fetch portfolio data."}, 500
+
+    rows = []
+    total_value = total_daily_change = 0
+    for item in holdings:
+        quote = quotes.get(item["symbol"].upper())
+        if quote is None:
+            rows.append({"symbol": item["symbol"], "quantity": item["quantity"], "error": f"No data found for {item['symbol']}"})
+            continue
+
+        price = quote["price"] * usd_to_php
+        daily_change = (quote["price"] - quote["previous_close"]) * usd_to_php
+        value = price * item["quantity"]
+        total_value += value
+        total_daily_change += daily_change * item["quantity"]
+
+        rows.append({
+            "symbol": item["symbol"],
+            "quantity": item["quantity"],
+            "name": quote["name"],
+            "sector": quote["sector"],
+            "market_cap": quote["market_cap"],
+            "price": price,
+            "daily_change": daily_change,
+            "change_percent": (quote["price"] / quote["previous_close"] - 1) * 100 if quote["previous_close"] else 0,
+            "value": value
+        })
+
+    return jsonify({
+        "holdings": rows,
+        "total_value": total_value,
+        "total_daily_change": total_daily_change,
+        "usd_to_php": usd_to_php,
+        "fx_as_of": fx_as_of.isoformat()
+    })
+
 @bp.route("/add_investment", methods=["POST"])
 @login_required
 def add_investment():
@@ -369,67 +650,53 @@ def add_investment():
         flash("Quantity must be a positive number.", "error")
         return redirect(url_for("pages.investments"))
 
-    # Update or add the investment to the session list
-    found = False
-
-    if "investments" not in session:
-        session["investments"] = []
-
-    for item in session['investments']:
-        if item['symbol'] == symbol:
-            item['quantity'] += quantity
-            found = True
-            break
-    
-    if not found:
-        session['investments'].append({
-            'symbol': symbol,
-            'quantity': quantity
-        })
-
-    # The session needs to be modified for Flask to save changes.
-    session.modified = True
-    return render_template("pages/investment_tracker.html", holdings=session["investments"])
+    import_session_holdings()
+    add_holding(current_user.id, symbol, quantity)
+    db.session.commit()
+    return redirect(url_for("pages.investments"))
 
-# Route to remove an investment from the session
+# Route to remove an investment
 @bp.route("/remove_investment", methods=["POST"])
 @login_required
 def remove_investment():
+    import_session_holdings()
     symbol_to_remove = request.form['symbol'].upper()
-    session['investments'] = [
-        item for item in session['investments'] if item['symbol'] != symbol_to_remove
-    ]
-    session.modified = True
+    Holding.query.filter_by(user_id=current_user.id, symbol=symbol_to_remove).delete()
+    db.session.commit()
     flash("Investment removed successfully!", "success")
     return redirect(url_for("pages.investments"))
 
 def get_usd_to_php():
-    import yfinance as yf
-    ticker = yf.Ticker("USDPHP=X")
-    data = ticker.history(period="1d")
-    if not data.empty:
-        return float(data["Close"].iloc[-1])
-    return 1.0  # fallback
+    """
+    Returns the latest known USD to PHP rate from memory.
+
+    Raises:
+        FxRateUnavailable: If no rate has ever been fetched.
+    """
+    rate, _ = fx_rates.get()
+    return rate
 
 
 @bp.route("/api/stock_history/<symbol>")
 @login_required
-def get_stock_history(symbol):
-    import yfinance as yf
+async def get_stock_history(symbol):
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="1mo")
-
-        if hist.empty:
-            return {"error": f"No history found for {symbol}"}, 404
+        # get_history reads and writes price snapshots, so it runs with a copy of this request's context
+        hist = await upstreams["market_data"].call(copy_current_request_context(price_history.get_history), symbol)
 
         usd_to_php = get_usd_to_php()
 
-        dates = hist.index.strftime("%Y-%m-%d").tolist()
-        prices = (hist["Close"] * usd_to_php).round(2).tolist()
+        dates = hist["dates"]
+        prices = [round(close * usd_to_php, 2) for close in hist["closes"]]
 
         return jsonify({"dates": dates, "prices": prices})
 
+    except (FxRateUnavailable, UpstreamBusy) as e:
+        return {"error": str(e)}, 503
+    except UpstreamTimeout as e:
+        return {"error": str(e)}, 504
+    except LookupError as e:
+        return {"error": str(e)}, 404
     except Exception as e:
         current_app.logger.error(f"Failed to fetch history for {symbol}: {e}")
         return {"error": "Failed to fetch stock history."}, 500
@@ -0,0 +1,114 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy import func
+
+from board.models import db, Holding, PriceSnapshot
+from board.market_data import market_data
+from board.db_config import dialect_insert
+
+HISTORY_DAYS = 31
+
+# Smallest Yahoo period that covers a gap of up to this many days
+_PERIODS = [(5, "5d"), (31, "1mo"), (92, "3mo"), (183, "6mo"), (366, "1y"), (731, "2y"), (1827, "5y")]
+
+def period_for(days):
+    """Returns the shortest Yahoo Finance period covering the given number of days."""
+    for limit, period in _PERIODS:
+        if days <= limit:
+            return period
+    return "max"
+
+def store_closes(symbol, dates, closes, before=None):
+    """
+    Inserts or updates daily closes for a symbol. Nothing is committed here.
+
+    Args:
+        dates (list): "YYYY-MM-DD" strings.
+        closes (list): Closing prices (USD), in the same order.
+        before (date): Only store days before this one, so an unfinished
+            trading day is never saved as a close.
+
+    Returns:
+        int: The number of days written.
+    """
+    rows = {date.fromisoformat(day): close for day, close in zip(dates, closes)}
+    if before is not None:
+        rows = {day: close for day, close in rows.items() if day < before}
+    if not rows:
+        return 0
+
+    # One upsert, so concurrent first views of a symbol don't collide on _symbol_day_uc
+    statement = dialect_insert(PriceSnapshot)
+    db.session.execute(
+        statement.on_conflict_do_update(index_elements=["symbol", "day"], set_={"close": statement.excluded.close}),
+        [{"symbol": symbol, "day": day, "close": close} for day, close in rows.items()]
+    )
+    return len(rows)
+
+def get_history(symbol, days=HISTORY_DAYS):
+    """
+    Returns a symbol's daily closes for the last `days` days. Completed days
+    are read from the price_snapshot table; only the tail after the last
+    stored day (including today's unfinished session) is fetched upstream,
+    and the completed part of that tail is stored for next time.
+
+    Returns:
+        dict: {"dates": ["YYYY-MM-DD", ...], "closes": [float, ...]}, oldest first.
+
+    Raises:
+        LookupError: If there is no stored or upstream history for the symbol.
+    """
+    symbol = symbol.upper()
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days)
+
+    latest = db.session.query(func.max(PriceSnapshot.day)) \
+        .filter(PriceSnapshot.symbol == symbol, PriceSnapshot.day >= start).scalar()
+    tail_start = latest + timedelta(days=1) if latest else start
+
+    try:
+        # Goes through the market data cache, so repeated views share one small fetch
+        tail = market_data.history(symbol, period=period_for((today - tail_start).days))
+    except Exception as e:
+        if latest is None:
+            raise
+        tail = {"dates": [], "closes": []}
+        market_data.app.logger.warning(f"Serving stored history for {symbol}; tail fetch failed: {e}")
+
+    if store_closes(symbol, tail["dates"], tail["closes"], before=today):
+        db.session.commit()
+
+    snapshots = PriceSnapshot.query.filter(
+        PriceSnapshot.symbol == symbol, PriceSnapshot.day >= start, PriceSnapshot.day < today
+    ).order_by(PriceSnapshot.day).all()
+    dates = [snapshot.day.isoformat() for snapshot in snapshots]
+    closes = [snapshot.close for snapshot in snapshots]
+
+    # Today's price isn't a close yet; show it without storing it
+    for day, close in zip(tail["dates"], tail["closes"]):
+        if date.fromisoformat(day) >= today:
+            dates.append(day)
+            closes.append(close)
+
+    if not dates:
+        raise LookupError(f"No history found for {symbol}")
+    return {"dates": dates, "closes": closes}
+
+def snapshot_holdings(period="5d"):
+    """
+    Appends the latest daily closes of every held symbol with one batched download.
+
+    Returns:
+        tuple: (symbols updated, days written)
+    """
+    symbols = [symbol for (symbol,) in db.session.query(Holding.symbol).distinct()]
+    if not symbols:
+        return 0, 0
+
+    today = datetime.utcnow().date()
+    series = market_data.provider.daily_closes(symbols, period)
+    written = sum(
+        store_closes(symbol, closes["dates"], closes["closes"], before=today)
+        for symbol, closes in series.items()
+    )
+    db.session.commit()
+    return len(series), written
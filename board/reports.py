@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+
+from board.models import db, Transaction, DailyRollup, Category
+
+# Goal distributions are recorded as expenses but are not spending
+GOAL_DISTRIBUTION_PREFIX = "Distributed to goal:"
+
+# Philippines annual inflation rate as of August 2025
+ANNUAL_INFLATION_RATE = 0.015
+FORECAST_DAYS = 7
+
+# Longest balance series built per request; it's filled in one day at a time
+MAX_BALANCE_DAYS = 3660
+
+def parse_date_range(args):
+    """
+    Reads an optional ?start=YYYY-MM-DD&end=YYYY-MM-DD range from request args.
+
+    Returns:
+        tuple: (start date or None, end date or None)
+
+    Raises:
+        ValueError: If a date is malformed or start is after end.
+    """
+    start = args.get("start")
+    end = args.get("end")
+    start = datetime.strptime(start, "%Y-%m-%d").date() if start else None
+    end = datetime.strptime(end, "%Y-%m-%d").date() if end else None
+
+    if start and end and start > end:
+        raise ValueError("Start date must not be after end date.")
+
+    return start, end
+
+def _filter_range(query, start, end):
+    if start:
+        query = query.filter(Transaction.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.filter(Transaction.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return query
+
+def expense_breakdown(user_id, start=None, end=None, limit=None):
+    """
+    Sums a user's expenses per description, excluding goal distributions.
+
+    Args:
+        limit (int): Only return this many of the largest descriptions.
+
+    Returns:
+        list: [{"description": str, "total": Decimal}], largest first.
+    """
+    total = func.sum(Transaction.amount).label("total")
+    query = db.session.query(Transaction.description, total).filter(
+        Transaction.user_id == user_id,
+        Transaction.type == "expense",
+        ~Transaction.description.startswith(GOAL_DISTRIBUTION_PREFIX)
+    )
+    query = _filter_range(query, start, end).group_by(Transaction.description).order_by(total.desc())
+    rows = query.limit(limit).all() if limit else query.all()
+    return [{"description": description, "total": amount} for description, amount in rows]
+
+def category_breakdown(user_id, start=None, end=None, kind="expense"):
+    """
+    Sums a user's transactions per category. The sums are read from the
+    ix_transaction_user_category_created index alone, so this stays cheap
+    however varied the descriptions are.
+
+    Args:
+        kind (str): "expense" or "income". Goal distributions have their own
+            kind and are never counted as either.
+
+    Returns:
+        list: [{"category": str, "total": Decimal}], largest first.
+    """
+    names = dict(db.session.query(Category.id, Category.name).filter(Category.kind == kind).all())
+    if not names:
+        return []
+
+    total = func.sum(Transaction.amount).label("total")
+    query = db.session.query(Transaction.category_id, total).filter(
+        Transaction.user_id == user_id,
+        Transaction.category_id.in_(names)
+    )
+    rows = _filter_range(query, start, end).group_by(Transaction.category_id).order_by(total.desc()).all()
+    return [{"category": names[category_id], "total": amount} for category_id, amount in rows]
+
+def daily_flow(user_id, start=None, end=None):
+    """
+    Reads a user's income and expenses per calendar day (UTC) from the daily rollups.
+
+    Returns:
+        list: [{"date": "YYYY-MM-DD", "income": Decimal, "expense": Decimal, "net": Decimal}],
+        only for days that have transactions, oldest first.
+    """
+    query = DailyRollup.query.filter(DailyRollup.user_id == user_id)
+    if start:
+        query = query.filter(DailyRollup.day >= start)
+    if end:
+        query = query.filter(DailyRollup.day <= end)
+
+    return [
+        {"date": r.day.isoformat(), "income": r.income, "expense": r.expense, "net": r.income - r.expense}
+        for r in query.order_by(DailyRollup.day).all()
+    ]
+
+def running_balance(user_id, start=None, end=None):
+    """
+    Builds a continuous end-of-day balance series for every day in the range
+    from the daily rollups, so the cost is proportional to the days in view.
+    Defaults to the user's first transaction day (at most MAX_BALANCE_DAYS
+    back) through today.
+
+    Returns:
+        dict: {"dates": [...], "balances": [...]}
+
+    Raises:
+        ValueError: If the range is longer than MAX_BALANCE_DAYS.
+    """
+    today = datetime.utcnow().date()
+    if start is None:
+        first = db.session.query(func.min(DailyRollup.day)).filter(DailyRollup.user_id == user_id).scalar()
+        end = end or max(today, first or today)
+        start = min(max(first or today, end - timedelta(days=MAX_BALANCE_DAYS - 1)), end)
+    elif end is None:
+        end = max(today, start)
+    if (end - start).days >= MAX_BALANCE_DAYS:
+        raise ValueError(f"The balance can be shown for at most {MAX_BALANCE_DAYS} days at a time.")
+
+    # The balance carried into the range is the closing balance of the last earlier day
+    opening = db.session.query(DailyRollup.closing_balance) \
+        .filter(DailyRollup.user_id == user_id, DailyRollup.day < start) \
+        .order_by(DailyRollup.day.desc()).limit(1).scalar() or 0
+
+    rollups = DailyRollup.query.filter(
+        DailyRollup.user_id == user_id, DailyRollup.day >= start, DailyRollup.day <= end
+    ).all()
+    closing_by_day = {r.day: r.closing_balance for r in rollups}
+
+    dates, balances = [], []
+    balance = opening
+    current = start
+    while current <= end:
+        balance = closing_by_day.get(current, balance)
+        dates.append(current.isoformat())
+        balances.append(balance)
+        current += timedelta(days=1)
+
+    return {"dates": dates, "balances": balances}
+
+def cash_flow(user_id, start=None, end=None, forecast_days=FORECAST_DAYS, annual_inflation_rate=ANNUAL_INFLATION_RATE):
+    """
+    Builds the dashboard's cash-flow series: the historical balance, its
+    inflation-adjusted value, and a linear forecast for the following days.
+
+    Returns:
+        dict: The running_balance series plus "inflation_adjusted" (discounted
+        to the first day in view), a "forecast" dict with its own dates,
+        balances and inflation_adjusted lists, and "inflation_adjusted_balance":
+        the last balance discounted to the user's first transaction day,
+        however short the range.
+
+    Raises:
+        ValueError: If the range is longer than MAX_BALANCE_DAYS.
+    """
+    series = running_balance(user_id, start, end)
+    # The projection is an estimate, so it's done in floats
+    balances = [float(balance) for balance in series["balances"]]
+    daily_inflation_rate = (1 + annual_inflation_rate) ** (1 / 365) - 1
+
+    # Discount each day's balance back to the first day in view
+    discount = 1.0
+    inflation_adjusted = []
+    for balance in balances:
+        inflation_adjusted.append(balance / discount)
+        discount *= 1 + daily_inflation_rate
+
+    # Project the average daily change forward, eroding the adjusted balance by inflation
+    total_days = max(len(balances) - 1, 1)
+    average_daily_change = (balances[-1] - balances[0]) / total_days
+    last_day = datetime.strptime(series["dates"][-1], "%Y-%m-%d").date()
+    balance, adjusted = balances[-1], inflation_adjusted[-1]
+
+    forecast = {"dates": [], "balances": [], "inflation_adjusted": []}
+    for offset in range(1, forecast_days + 1):
+        balance += average_daily_change
+        adjusted += average_daily_change - adjusted * daily_inflation_rate
+        forecast["dates"].append((last_day + timedelta(days=offset)).isoformat())
+        forecast["balances"].append(balance)
+        forecast["inflation_adjusted"].append(adjusted)
+
+    first = db.session.query(func.min(DailyRollup.day)).filter(DailyRollup.user_id == user_id).scalar()
+    days_since_first = max((last_day - first).days, 0) if first else 0
+
+    series.update(
+        inflation_adjusted=inflation_adjusted,
+        inflation_adjusted_balance=balances[-1] / (1 + daily_inflation_rate) ** days_since_first,
+        forecast=forecast,
+        annual_inflation_rate=annual_inflation_rate
+    )
+    return series
@@ -0,0 +1,143 @@
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class UpstreamBusy(RuntimeError):
+    """Raised when an upstream already has as many calls in flight as it is allowed."""
+
+class UpstreamTimeout(TimeoutError):
+    """Raised when an upstream call takes longer than its timeout."""
+
+class Bulkhead:
+    """
+    Isolates calls to one upstream service. Each upstream gets its own thread
+    pool and a cap on concurrent calls, so a slow upstream can only tie up
+    its own slots: once they are all taken, further requests fail fast with
+    UpstreamBusy instead of queueing behind it, and every call is abandoned
+    after `timeout` seconds.
+
+    A call that times out keeps its slot until the underlying request
+    actually returns, so the cap holds even when the upstream hangs.
+    Streamed calls are abandoned after `stream_timeout` seconds (default:
+    `timeout`).
+    """
+
+    def __init__(self, name, max_concurrent, timeout, stream_timeout=None, acquire_timeout=0.5):
+        self.name = name
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout or timeout
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f"upstream-{name}")
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on this upstream's pool and awaits the result.
+
+        Raises:
+            UpstreamBusy: If no slot frees up within acquire_timeout seconds.
+            UpstreamTimeout: If the call doesn't finish within timeout seconds.
+        """
+        # Flask runs each async view on its own event loop in a worker thread,
+        # so waiting here only holds up this request
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise UpstreamBusy(f"Too many requests to {self.name} in progress. Please try again shortly.")
+
+        try:
+            future = self._executor.submit(self._run, fn, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        # A call cancelled before it started never reaches _run's release
+        future.add_done_callback(lambda f: f.cancelled() and self._slots.release())
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamTimeout(f"{self.name} did not respond within {self.timeout} seconds.")
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Iterates over the chunks of a streamed call, fn(*args, **kwargs)
+        returning an iterator. The upstream is read on this upstream's pool
+        into a queue, so the slot is held only while the upstream is sending,
+        not while a slow client reads; reading stops, and the slot is
+        released, once the stream ends, fails, is closed by the caller or
+        passes stream_timeout seconds.
+
+        Raises:
+            UpstreamBusy: If no slot frees up within acquire_timeout seconds.
+            UpstreamTimeout: If the stream doesn't finish within stream_timeout seconds.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise UpstreamBusy(f"Too many requests to {self.name} in progress. Please try again shortly.")
+
+        deadline = time.monotonic() + self.stream_timeout
+        chunks, stop, end = queue.Queue(), threading.Event(), object()
+
+        def read():
+            try:
+                for chunk in fn(*args, **kwargs):
+                    chunks.put(chunk)
+                    if stop.is_set() or time.monotonic() > deadline:
+                        return
+                chunks.put(end)
+            except Exception as e:
+                chunks.put(e)
+
+        try:
+            future = self._executor.submit(self._run, read, (), {})
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: f.cancelled() and self._slots.release())
+
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    raise UpstreamTimeout(f"{self.name} did not finish within {self.stream_timeout} seconds.")
+                if chunk is end:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            stop.set()
+            future.cancel()
+
+    def _run(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+class Upstreams:
+    """
+    The bulkheads for every slow upstream the app calls, configured through
+    UPSTREAM_LIMITS: {name: {"max_concurrent": int, "timeout": seconds,
+    "stream_timeout": seconds (optional)}}.
+    """
+
+    def __init__(self, app=None):
+        self._bulkheads = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("UPSTREAM_LIMITS", {
+            "gemini": {"max_concurrent": 4, "timeout": 30, "stream_timeout": 90},
+            "market_data": {"max_concurrent": 8, "timeout": 20},
+        })
+        app.extensions["upstreams"] = self
+        self._bulkheads = {
+            name: Bulkhead(name, **limits) for name, limits in app.config["UPSTREAM_LIMITS"].items()
+        }
+
+    def __getitem__(self, name):
+        return self._bulkheads[name]
+
+upstreams = Upstreams()
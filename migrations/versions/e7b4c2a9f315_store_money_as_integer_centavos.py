@@ -0,0 +1,52 @@
+"""Store money as integer centavos
+
+Revision ID: e7b4c2a9f315
+Revises: 6c3e8d1f4b52
+Create Date: 2025-10-03 09:41:18.530217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b4c2a9f315'
+down_revision = '6c3e8d1f4b52'
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = {
+    'transaction': ('amount',),
+    'goal': ('target_amount', 'current_amount'),
+    'ledger': ('income', 'expense'),
+    'daily_rollup': ('income', 'expense', 'closing_balance'),
+}
+
+
+def upgrade():
+    for table_name, columns in MONEY_COLUMNS.items():
+        # Turn pesos into whole centavos in place, then narrow the column to an integer
+        table = sa.table(table_name, *(sa.column(name) for name in columns))
+        op.execute(table.update().values({name: sa.func.round(table.c[name] * 100) for name in columns}))
+
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for name in columns:
+                batch_op.alter_column(name,
+                       existing_type=sa.Float(),
+                       type_=sa.BigInteger(),
+                       existing_nullable=False,
+                       postgresql_using=f'{name}::bigint')
+
+
+def downgrade():
+    for table_name, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for name in columns:
+                batch_op.alter_column(name,
+                       existing_type=sa.BigInteger(),
+                       type_=sa.Float(),
+                       existing_nullable=False,
+                       postgresql_using=f'{name}::double precision')
+
+        table = sa.table(table_name, *(sa.column(name) for name in columns))
+        op.execute(table.update().values({name: table.c[name] / 100.0 for name in columns}))